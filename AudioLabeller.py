@@ -1,6 +1,7 @@
+import time
+_START_TIME = time.perf_counter()  # 用于测量启动耗时
+
 import os
-import glob
-import json
 import numpy as np
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -11,28 +12,44 @@ from PyQt5.QtGui import QPainter, QColor, QPen, QBrush
 
 import pyqtgraph as pg
 import soundfile as sf
-import librosa
-import librosa.display
-from scipy.io import wavfile
 
-import wave
-import pyaudio
-import pyaudio._portaudio as pa
-from threading import Event, Thread
+from labelio import (accepted_labels, find_wav_files, has_labels, label_json_path, make_label_data,
+                     read_label_file, write_label_file, label_file_version, LabelConflictError)
+from leases import LeaseManager, HEARTBEAT_INTERVAL
+from peakfile import WaveformPeaks
+from boundaries import BoundaryIndex, ZC_BLOCK, ZC_REMOTE_BLOCK
+from spectrogram import band_spectrogram, compute_spectrogram, decimation_factor, warm_imports
 
-def find_wav_files(folder_path):
-    """使用glob查找所有WAV文件（包括子文件夹）"""
-    return glob.glob(os.path.join(folder_path, '**/*.wav'), recursive=True)
+import wave
+from threading import Event, Lock, Thread
+
+# 按分析带宽降采样时，视图短于该时长（秒）才按原始采样率计算频谱细节
+FULL_RATE_WINDOW = 2.0
+# 频谱图纵轴放大到不足奈奎斯特频率的 BAND_ZOOM_FRACTION、且视图不长于 BAND_ZOOM_WINDOW 秒时，叠加该频带的高分辨率频谱
+BAND_ZOOM_FRACTION = 0.25
+BAND_ZOOM_WINDOW = 60.0
+# 拖动选区时边界吸附的范围（像素）；"Tighten All Labels" 收紧标注时的搜索范围（秒）
+SNAP_PIXELS = 8
+TIGHTEN_WINDOW = 0.05
+# 实时模式：刷新间隔（毫秒）和初始显示的时长（秒）
+LIVE_INTERVAL = 200
+LIVE_VIEW_SECONDS = 10
+# 启动预算（秒）：从导入本模块到主窗口显示，`python AudioLabeller.py --startup-check` 超出时返回非 0。
+# 较慢的 CI 机器可用环境变量 ANLABELER_STARTUP_BUDGET 放宽（见 test_startup.py）
+STARTUP_BUDGET = float(os.environ.get("ANLABELER_STARTUP_BUDGET", 0.5))
 
 class AudioPlayCanStop(Thread):
     """
     多线程播放。新线程播放，主线程不会被阻塞，可以暂停、启动、循环播放。
     """
     stream = None
-    p = pyaudio.PyAudio()  # 创建一个播放器
+    p = None  # 播放器，第一次播放时才创建（PyAudio() 会探测音频设备，较慢）
 
     def __init__(self, file=None, loop=False, file_data=None, sr=0, bw=0, ch=0, lambda_func=None):
         super().__init__()
+        import pyaudio
+        if AudioPlayCanStop.p is None:
+            AudioPlayCanStop.p = pyaudio.PyAudio()  # 创建一个播放器
         self.file = file
         self.sampwidth = bw
         self.channels = ch
@@ -61,6 +78,7 @@ class AudioPlayCanStop(Thread):
             self.sampwidth = self.wf.getsampwidth()  # 采样位宽
             self.channels = self.wf.getnchannels()
             self.rate = self.wf.getframerate()
+            import pyaudio
             self.format = pyaudio.get_format_from_width(self.sampwidth)
             return self.wf
 
@@ -108,6 +126,7 @@ class AudioPlayCanStop(Thread):
         self.stream.stop_stream()
         self.stream.close()
         self.p.terminate()
+        AudioPlayCanStop.p = None  # 已终止，下次播放重新创建
     def pause(self):
         self.__flag.clear()  # 设置为False, 让线程阻塞
         # dprint("pause playing audio")
@@ -136,21 +155,20 @@ class SyncViewBox(pg.ViewBox):
             for view in self.linked_views:
                 view.setXRange(*self.viewRange()[0], padding=0)
 
-    def mouseScrollEvent(self, ev, axis=None):
-        """鼠标滚轮缩放时同步所有链接的ViewBox"""
-        super().mouseScrollEvent(ev, axis)
+    def wheelEvent(self, ev, axis=None):
+        """鼠标滚轮缩放时同步所有链接的ViewBox（pyqtgraph 的滚轮处理函数是 wheelEvent）"""
+        super().wheelEvent(ev, axis)
         if ev.isAccepted():
             self._sync_linked_views()
 
     def _sync_linked_views(self):
-        """同步所有链接的ViewBox的显示范围"""
-        x_range, y_range = self.viewRange()
+        """同步所有链接的ViewBox的时间范围（纵轴单位不同：波形为幅度，频谱图为 Hz，不同步）"""
+        x_range = self.viewRange()[0]
         for view in self.linked_views:
-            # 避免递归调用（防止死循环）
+            # 只由滚轮事件触发，setRange 不会再回到这里，不必阻止信号；
+            # 阻止信号会使对方的坐标轴、波形细节和频谱细节都不更新
             if view is not self:
-                view.blockSignals(True)  # 临时阻止信号
-                view.setRange(xRange=x_range, yRange=y_range, padding=0)
-                view.blockSignals(False)
+                view.setRange(xRange=x_range, padding=0)
 
 class AudioViewer(pg.PlotWidget):
     """音频视图基类"""
@@ -176,6 +194,8 @@ class AudioViewer(pg.PlotWidget):
         self.selection_rect = None
         self.selection_active = False
         self.playback_pos = None
+        # 边界吸附函数 snap_func(t, tolerance) -> t，None 表示不吸附
+        self.snap_func = None
 
     def linkView(self, view):
         self.getViewBox().linkView(view.getViewBox())
@@ -183,8 +203,8 @@ class AudioViewer(pg.PlotWidget):
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             pos = self.plotItem.vb.mapSceneToView(event.pos())
-            self.selection_start = pos.x()
-            self.selection_end = pos.x()
+            self.selection_start = self.snap(pos.x(), event)
+            self.selection_end = self.selection_start
             self.selection_active = True
             self.update_selection_rect()
         super().mousePressEvent(event)
@@ -192,7 +212,7 @@ class AudioViewer(pg.PlotWidget):
     def mouseMoveEvent(self, event):
         if self.selection_active:
             pos = self.plotItem.vb.mapSceneToView(event.pos())
-            self.selection_end = pos.x()
+            self.selection_end = self.snap(pos.x(), event)
             self.update_selection_rect()
         super().mouseMoveEvent(event)
 
@@ -205,6 +225,12 @@ class AudioViewer(pg.PlotWidget):
                 self.selection_changed.emit(*self.get_selection())
         super().mouseReleaseEvent(event)
     
+    def snap(self, x, event):
+        """把选区边界吸附到 SNAP_PIXELS 像素内最近的候选（按住 Shift 时不吸附）"""
+        if self.snap_func is None or event.modifiers() & Qt.ShiftModifier:
+            return x
+        return self.snap_func(x, SNAP_PIXELS * self.plotItem.vb.viewPixelSize()[0])
+
     def update_selection_rect(self):
         if self.selection_start is not None and self.selection_end is not None:
             x0 = min(self.selection_start, self.selection_end)
@@ -259,8 +285,16 @@ class WaveformViewer(AudioViewer):
             symbolBrush=audition_green,  # 填充颜色
             symbolPen=None  # 边框颜色（None 表示无边框）  
         )
+        # 概览模式下的 RMS 包络
+        self.rms_plot = self.plot(pen=QColor(150, 240, 200))
         self.label_regions = []
 
+        # 峰值文件 / 原始采样的分级显示
+        self.peaks = None
+        self.sample_reader = None
+        self._lod_state = None
+        self.getViewBox().sigXRangeChanged.connect(self.update_waveform_lod)
+
         # 设置波形图和频谱图背景为黑色
         y_axis = self.getAxis('right')  # 'left' 表示左侧 Y 轴
 
@@ -277,7 +311,57 @@ class WaveformViewer(AudioViewer):
 
 
     def set_waveform(self, time_axis, data):
+        self.peaks = None
+        self.rms_plot.clear()
         self.waveform_plot.setData(time_axis, data)
+
+    def set_peaks(self, peaks, reader):
+        """
+        用峰值摘要显示波形，放大到足够细时才读取原始采样
+        :param peaks: peakfile.WaveformPeaks
+        :param reader: reader(start, stop) -> 该采样区间的单声道数据
+        """
+        self.peaks = peaks
+        self.sample_reader = reader
+        self._lod_state = None
+        self._show_range(0, peaks.n_samples)
+
+    def update_waveform_lod(self, *args):
+        """视图范围变化时按需切换显示层级"""
+        if self.peaks is None:
+            return
+        x0, x1 = self.viewRange()[0]
+        sr = self.peaks.sample_rate
+        self._show_range(int(x0 * sr), int(np.ceil(x1 * sr)))
+
+    def _show_range(self, start, end):
+        start, end = max(start, 0), min(end, self.peaks.n_samples)
+        if end <= start:
+            return
+        max_points = 2 * max(self.width(), 500)
+        level = self.peaks.choose_level(start, end, max_points)
+
+        # 同一层级且仍在已取数据的范围内时不重新取数
+        if self._lod_state is not None:
+            cur_level, cur_start, cur_end = self._lod_state
+            if cur_level == level and cur_start <= start and end <= cur_end:
+                return
+
+        # 两侧各多取半个视图宽度，平移时不必每次重新读取
+        margin = (end - start) // 2
+        start, end = max(start - margin, 0), min(end + margin, self.peaks.n_samples)
+        sr = self.peaks.sample_rate
+        if level is None:
+            data = self.sample_reader(start, end)
+            self.waveform_plot.setData(np.arange(start, start + len(data)) / sr, data)
+            self.waveform_plot.setSymbol('o')
+            self.rms_plot.clear()
+        else:
+            time_axis, minmax, rms = self.peaks.envelope(level, start, end)
+            self.waveform_plot.setSymbol(None)
+            self.waveform_plot.setData(time_axis, minmax)
+            self.rms_plot.setData(time_axis, rms)
+        self._lod_state = (level, start, end)
     
     def add_label_region(self, start, end, label_text, color='g'):
         """添加标签区域"""
@@ -346,6 +430,29 @@ class SpectrogramViewer(pg.PlotWidget):
         # 创建图像项
         self.img = pg.ImageItem()
         self.addItem(self.img)
+
+        # 局部细节图像（放大时按原始采样率计算的片段），叠加在整体频谱图之上
+        self.detail_img = pg.ImageItem()
+        self.detail_img.setZValue(1)
+        self.detail_img.hide()
+        self.addItem(self.detail_img)
+
+        # 频带放大图像（纵轴放大到窄频带时只为该频带计算的高分辨率频谱），叠加在最上层
+        self.band_img = pg.ImageItem()
+        self.band_img.setZValue(2)
+        self.band_img.hide()
+        self.addItem(self.band_img)
+
+        self.db_range = None
+        # 当前频谱图的 [xmin, xmax, ymin, ymax]（秒、Hz）；按分析带宽降采样时纵轴上限低于原始奈奎斯特频率
+        self.extent = None
+        # 每次换上新的频谱图（或清空）时加 1，后台算好的叠加图像按它丢弃过期的
+        self.image_generation = 0
+        # 对比度：只重映射查找表，不改动图像数据。histogram 为图像各量化级的像素数，每张频谱图统计一次
+        self.histogram = None
+        self.floor_db = None
+        self.ceiling_db = None
+        self.gamma = 1.0
         
         # 使用更适合音频的色图 magma plasma
         self.set_colormap('magma')
@@ -354,47 +461,121 @@ class SpectrogramViewer(pg.PlotWidget):
         self.getViewBox().setAspectLocked(False)
         self.getViewBox().setMouseEnabled(x=True, y=True)
 
+
     def set_colormap(self, name='plasma'):
         """设置颜色映射"""
         cmap = pg.colormap.get(name)
-        self.img.setLookupTable(cmap.getLookupTable(alpha=False))
+        self.cmap_lut = cmap.getLookupTable(nPts=256, alpha=False)
+        self.update_lookup_table()
+
+    def set_contrast(self, floor_db=None, ceiling_db=None, gamma=None):
+        """设置显示的 dB 下限 / 上限和 gamma（只更新查找表，大图也能立即重绘）"""
+        if floor_db is not None:
+            self.floor_db = floor_db
+        if ceiling_db is not None:
+            self.ceiling_db = ceiling_db
+        if gamma is not None:
+            self.gamma = gamma
+        self.update_lookup_table()
+
+    def auto_contrast(self, low=0.02, high=0.999):
+        """
+        按直方图的分位数设置下限 / 上限，让安静的事件也能看清
+        :return: (floor_db, ceiling_db)，没有频谱图时返回 None
+        """
+        if self.histogram is None or self.db_range is None:
+            return None
+        cdf = np.cumsum(self.histogram) / max(self.histogram.sum(), 1)
+        db_min, db_max = self.db_range
+        scale = (db_max - db_min) / (len(self.histogram) - 1)
+        floor_db = db_min + np.searchsorted(cdf, low) * scale
+        ceiling_db = db_min + np.searchsorted(cdf, high) * scale
+        self.set_contrast(floor_db, max(ceiling_db, floor_db + scale))
+        return self.floor_db, self.ceiling_db
+
+    def update_lookup_table(self):
+        """把图像的每个量化级按 dB 下限 / 上限和 gamma 映射到色图"""
+        n_levels = 256 if self.histogram is None else len(self.histogram)
+        lut = self.cmap_lut
+        if self.db_range is not None:
+            db_min, db_max = self.db_range
+            floor_db = db_min if self.floor_db is None else self.floor_db
+            ceiling_db = db_max if self.ceiling_db is None else self.ceiling_db
+            db = db_min + np.arange(n_levels) * (db_max - db_min) / (n_levels - 1)
+            x = np.clip((db - floor_db) / max(ceiling_db - floor_db, 1e-6), 0, 1) ** self.gamma
+            lut = self.cmap_lut[np.round(x * (len(self.cmap_lut) - 1)).astype(int)]
+        self.img.setLookupTable(lut)
+        self.detail_img.setLookupTable(lut)
+        self.band_img.setLookupTable(lut)
 
     def linkView(self, view):
         """链接其他视图"""
         self.getViewBox().linkView(view.getViewBox())
 
-    def set_spectrogram(self, data, extent=None):
+    def set_spectrogram_image(self, image, extent=None, db_range=None, auto_range=True):
         """
-        设置频谱图数据
-        :param data: 2D numpy数组 (freq_bins, time_frames)
-        :param extent: [xmin, xmax, ymin, ymax] 坐标范围
+        设置已量化的频谱图像（见 spectrogram_image），直接上传，不做转置和自动色阶
+        :param image: C连续整型数组 (time_frames, freq_bins)
+        :param extent: [xmin, xmax, ymin, ymax] 坐标范围（秒、Hz），与波形视图的时间轴一致
+        :param db_range: 图像 0 ~ 最大灰度对应的 (db_min, db_max)
+        :param auto_range: 是否重置视图范围（实时模式下由调用方控制滚动）
         """
-        # 数据预处理
-        if data.ndim != 2:
+        if image.ndim != 2:
             raise ValueError("频谱数据必须是2D数组")
 
-        # 设置图像数据
-        self.img.setImage(data.T, autoLevels=True)  # 转置使时间轴在x方向
-
-        # print(data.shape)
-        # for id, i in enumerate(data.T):
-        #     print(id, i[-5:] )
-
-        # 设置坐标范围
-        # if extent is not None:
-        #     self.img.setRect(QRectF(*extent))
-        # else:
-        #     # 自动计算范围
-        h, w = data.shape
-        self.img.setRect(QRectF(0, 0, w, h))
+        self.band_img.hide()
+        self.db_range = db_range
+        self.extent = extent
+        self.image_generation += 1
+        self.histogram = np.bincount(image.ravel(), minlength=np.iinfo(image.dtype).max + 1)
+        self.update_lookup_table()
+        self.img.setImage(image, autoLevels=False, levels=(0, np.iinfo(image.dtype).max))
+
+        if extent is not None:
+            xmin, xmax, ymin, ymax = extent
+            self.img.setRect(QRectF(xmin, ymin, xmax - xmin, ymax - ymin))
+        else:
+            w, h = image.shape
+            self.img.setRect(QRectF(0, 0, w, h))
 
-        # 自动调整色阶
-        self.img.setLevels([data.min(), data.max()])
-        
         # 刷新显示
-        self.getViewBox().autoRange()
+        if auto_range:
+            self.getViewBox().autoRange()
+
+    def set_detail_image(self, image, extent):
+        """叠加一块局部细节图像（extent 含义同 set_spectrogram_image），不改变视图范围"""
+        self.detail_img.setImage(image, autoLevels=False, levels=(0, np.iinfo(image.dtype).max))
+        xmin, xmax, ymin, ymax = extent
+        self.detail_img.setRect(QRectF(xmin, ymin, xmax - xmin, ymax - ymin))
+        self.detail_img.show()
+
+    def clear_detail_image(self):
+        self.detail_img.hide()
+
+    def clear_spectrogram(self):
+        """清空频谱图（后台计算完成前不显示上一个文件的频谱）"""
+        self.img.clear()
+        self.extent = None
+        self.image_generation += 1
+        self.detail_img.hide()
+        self.band_img.hide()
+
+    def set_band_image(self, image, extent):
+        """叠加频带放大图像（extent 含义同 set_spectrogram_image），不改变视图范围"""
+        self.band_img.setImage(image, autoLevels=False, levels=(0, np.iinfo(image.dtype).max))
+        xmin, xmax, ymin, ymax = extent
+        self.band_img.setRect(QRectF(xmin, ymin, xmax - xmin, ymax - ymin))
+        self.band_img.show()
+
+    def clear_band_image(self):
+        self.band_img.hide()
 
 class AudioLabeler(QMainWindow):
+    # 后台解码完成：(解码序号, (采样, 采样率, 频谱图像, extent, db_range) 或异常)
+    audio_decoded = pyqtSignal(int, object)
+    # 后台叠加图像完成：(视图序号, 频谱图序号, "detail" / "band", (图像, extent) 或异常)
+    view_image_ready = pyqtSignal(int, int, str, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("PyAudioLabeler - Enhanced")
@@ -402,6 +583,10 @@ class AudioLabeler(QMainWindow):
         
         self.audio_data = None
         self.sample_rate = None
+        self.n_samples = 0
+        self.peaks = None
+        # 后台解码的序号，切换文件后旧的解码结果按序号丢弃
+        self.decode_generation = 0
 
         self.file_path = None
         self.labels = []
@@ -410,9 +595,62 @@ class AudioLabeler(QMainWindow):
         # ...其他初始化代码...
         self.current_file_index = 0
         self.wav_files = []
+        self.folder_path = None
+        self.similarity_index = None
+        self.boundary_index = None
+
+        # 复核模式（review.ReviewSession），逐个显示整个文件夹中已有的标注片段
+        self.review = None
+
+        # 实时模式（live.WavTail），跟踪一个仍在录音的文件
+        self.live = None
+        self.live_end = None
+        self.live_timer = QTimer()
+        self.live_timer.timeout.connect(self.update_live)
+
+        # 拼接时间轴模式（timeline.Timeline），把连续的多个短文件首尾相接显示
+        self.timeline = None
+        self.timeline_lines = []
+
+        # 重复文件（fingerprint 索引）：path -> 所在重复组，组内第一个文件为代表
+        self.duplicates = {}
+        # 可以接收复制标注的副本：path -> 其标注文件的版本号。只包含分组时还没有标注的副本，
+        # 以及之后由本实例写入过的副本；写入时按该版本检查，副本被他人标注过就不再覆盖
+        self.duplicate_versions = {}
+
+        # 预标注插件（prelabel 模块，"模块:函数" 或 "文件.py:函数"），其预测作为待复核标注加载
+        self.prelabel_model = None
+        # 选定插件时算出的缓存键，以及当前文件夹的预测缓存（prelabel.PrelabelCache），打开文件时直接查询
+        self.prelabel_key = None
+        self.prelabel_cache = None
+
+        # 瘦客户端模式（连接 label_server）时文件、波形、频谱图和标注都来自服务端
+        self.client = None
+
+        # 共享文件夹模式：多人同时标注时用租约领取文件，标注文件写入时做版本检查
+        self.shared_mode = False
+        self.leases = LeaseManager()
+        self.labels_version = 0
+        self.lease_timer = QTimer()
+        self.lease_timer.timeout.connect(self.leases.refresh_all)
+        self.lease_timer.start(HEARTBEAT_INTERVAL * 1000)
+
+        # 分析带宽（Hz），None 为全频带；高采样率音频按该带宽抽取后再计算频谱图
+        self.analysis_bandwidth = None
+        self.detail_timer = QTimer()
+        self.detail_timer.setSingleShot(True)
+        self.detail_timer.timeout.connect(self.update_view_images)
+        # 频谱细节和频带放大在后台线程中计算：每种只保留最新的请求，视图范围或频谱图变了的结果丢弃
+        self.view_generation = 0
+        self.view_jobs = {}
+        self.view_jobs_lock = Lock()
+        self.view_jobs_event = Event()
+        self.view_worker = None
 
         self.init_ui()
         self.init_menubar()
+        self.audio_decoded.connect(self.on_audio_decoded)
+        self.view_image_ready.connect(self.on_view_image_ready)
         
         # 音频播放相关
         # self.audio_player = AudioPlayCanStop()
@@ -531,16 +769,49 @@ class AudioLabeler(QMainWindow):
         # 连接选择信号
         self.waveform_view.selection_changed.connect(self.on_selection_changed)
 
+        # 视图范围变化后（停顿片刻再）更新频谱细节
+        for view in (self.waveform_view, self.spectrogram_view):
+            view.getViewBox().sigXRangeChanged.connect(lambda *args: self.detail_timer.start(150))
+        self.spectrogram_view.getViewBox().sigYRangeChanged.connect(lambda *args: self.detail_timer.start(150))
+
         view_layout.addWidget(self.waveform_view)
         view_layout.addWidget(self.spectrogram_view)
 
+        # 频谱图对比度：dB 下限 / 上限和 gamma，只改查找表
+        contrast_layout = QHBoxLayout()
+        self.floor_slider = QSlider(Qt.Horizontal)
+        self.floor_slider.setRange(-80, 0)
+        self.floor_slider.setValue(-80)
+        self.ceiling_slider = QSlider(Qt.Horizontal)
+        self.ceiling_slider.setRange(-80, 0)
+        self.ceiling_slider.setValue(0)
+        self.gamma_slider = QSlider(Qt.Horizontal)
+        self.gamma_slider.setRange(20, 300)  # gamma * 100
+        self.gamma_slider.setValue(100)
+        for slider in (self.floor_slider, self.ceiling_slider, self.gamma_slider):
+            slider.valueChanged.connect(self.contrast_changed)
+        self.auto_contrast_btn = QPushButton("Auto Contrast")
+        self.auto_contrast_btn.clicked.connect(self.auto_contrast)
+        for text, widget in (("Floor dB", self.floor_slider), ("Ceiling dB", self.ceiling_slider),
+                             ("Gamma", self.gamma_slider)):
+            contrast_layout.addWidget(QLabel(text))
+            contrast_layout.addWidget(widget)
+        contrast_layout.addWidget(self.auto_contrast_btn)
+        view_layout.addLayout(contrast_layout)
+
         # 下部：标签列表
         self.label_list = QListWidget()
         self.label_list.itemDoubleClicked.connect(self.on_label_double_clicked)
 
+        # 相似片段候选列表（Find Similar 的结果），双击跳转
+        self.candidate_list = QListWidget()
+        self.candidate_list.itemDoubleClicked.connect(self.on_candidate_double_clicked)
+        self.candidate_list.hide()
+
         splitter.addWidget(view_widget)
         splitter.addWidget(self.label_list)
-        splitter.setSizes([600, 200])
+        splitter.addWidget(self.candidate_list)
+        splitter.setSizes([600, 200, 200])
 
         # 时间轴滑块
         self.time_slider = QSlider(Qt.Horizontal)
@@ -565,6 +836,23 @@ class AudioLabeler(QMainWindow):
         open_d_action.triggered.connect(self.open_folder)
         open_d_action.setShortcut('Ctrl+Shift+O')
 
+        connect_action = file_menu.addAction("Connect Server")
+        connect_action.triggered.connect(self.connect_server)
+
+        self.skip_duplicates_action = file_menu.addAction("Skip Duplicates")
+        self.skip_duplicates_action.setCheckable(True)
+        self.skip_duplicates_action.toggled.connect(self.set_skip_duplicates)
+
+        shared_action = file_menu.addAction("Shared Folder Mode")
+        shared_action.setCheckable(True)
+        shared_action.toggled.connect(self.set_shared_mode)
+
+        live_action = file_menu.addAction("Live Mode")
+        live_action.triggered.connect(self.start_live)
+
+        review_action = file_menu.addAction("Review Labels")
+        review_action.triggered.connect(self.start_review)
+
         save_action = file_menu.addAction("Save Labels")
         save_action.triggered.connect(self.save_labels)
 
@@ -585,40 +873,263 @@ class AudioLabeler(QMainWindow):
         
         clear_labels_action = edit_menu.addAction("Clear Labels")
         clear_labels_action.triggered.connect(self.clear_labels)
+
+        import_labels_action = edit_menu.addAction("Import Labels")
+        import_labels_action.triggered.connect(self.import_labels)
+
+        propagate_action = edit_menu.addAction("Copy Labels to Duplicates")
+        propagate_action.triggered.connect(self.propagate_labels)
+
+        tighten_action = edit_menu.addAction("Tighten All Labels")
+        tighten_action.triggered.connect(self.tighten_labels)
+
+        find_similar_action = edit_menu.addAction("Find Similar")
+        find_similar_action.triggered.connect(self.find_similar)
+        find_similar_action.setShortcut('Ctrl+F')
+
+        prelabel_file_action = edit_menu.addAction("Pre-label File")
+        prelabel_file_action.triggered.connect(self.prelabel_file)
+
+        prelabel_folder_action = edit_menu.addAction("Pre-label Folder")
+        prelabel_folder_action.triggered.connect(self.prelabel_folder)
+
+        accept_proposal_action = edit_menu.addAction("Accept Proposal")
+        accept_proposal_action.triggered.connect(self.accept_proposal)
+        accept_proposal_action.setShortcut('Ctrl+Return')
+
+        accept_all_action = edit_menu.addAction("Accept All Proposals")
+        accept_all_action.triggered.connect(lambda: self.accept_proposal(all_proposals=True))
+
+        # 视图菜单
+        view_menu = menubar.addMenu("View")
+
+        bandwidth_action = view_menu.addAction("Analysis Bandwidth")
+        bandwidth_action.triggered.connect(self.set_analysis_bandwidth)
+
+        self.timeline_action = view_menu.addAction("Concatenated Timeline")
+        self.timeline_action.setCheckable(True)
+        self.timeline_action.toggled.connect(self.set_timeline_mode)
+
+        # 复核菜单：单键操作，只在复核模式下可用
+        review_menu = menubar.addMenu("Review")
+        self.review_actions = []
+        for text, shortcut, slot in (("Accept", 'A', lambda: self.review_decide("accept")),
+                                     ("Relabel", 'R', lambda: self.review_decide("relabel")),
+                                     ("Reject", 'X', lambda: self.review_decide("reject")),
+                                     ("Skip", 'N', lambda: self.review_decide("skip")),
+                                     ("Stop Review", 'Esc', self.stop_review)):
+            action = review_menu.addAction(text)
+            action.setShortcut(shortcut)
+            action.triggered.connect(slot)
+            action.setEnabled(False)
+            self.review_actions.append(action)
     
     def open_folder(self):
         """打开文件夹并加载所有WAV文件"""
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder with WAV Files")
         if folder_path:
+            self.folder_path = folder_path
+            self.similarity_index = None
+            self.duplicates = {}
+            self.duplicate_versions = {}
+            self.skip_duplicates_action.blockSignals(True)
+            self.skip_duplicates_action.setChecked(False)
+            self.skip_duplicates_action.blockSignals(False)
             self.wav_files = sorted(find_wav_files(folder_path))
             if self.wav_files:
                 self.current_file_index = 0
-                self.load_audio_file(self.wav_files[0])
+                if self.shared_mode:
+                    index = self.claim_file(0)
+                    if index is None:
+                        return
+                    self.current_file_index = index
+                self.load_audio_file(self.wav_files[self.current_file_index])
                 self.update_nav_buttons()
 
+    def set_shared_mode(self, enabled):
+        """切换共享文件夹模式"""
+        self.shared_mode = enabled
+        if enabled:
+            if self.file_path in self.wav_files and not self.leases.acquire(self.file_path):
+                self.statusBar().showMessage(f"{os.path.basename(self.file_path)} is being labeled by someone else")
+        else:
+            self.leases.release_all()
+
+    def claim_file(self, start, step=1):
+        """
+        共享文件夹模式：从 start 开始按 step 方向找到下一个未被他人领取的文件并获取租约
+        向后查找时跳过已有标注的文件（只有预标注的不算），获取成功后释放当前文件的租约
+        :return: 文件下标，没有可用文件时返回 None
+        """
+        skip = (lambda path: has_labels(label_json_path(path))) if step > 0 else None
+        index = self.leases.claim_next(self.wav_files, start % len(self.wav_files), step, skip)
+        if index is None:
+            self.statusBar().showMessage("All files are labeled or being labeled by others")
+            return None
+        if self.file_path in self.leases.held and self.file_path != self.wav_files[index]:
+            self.leases.release(self.file_path)
+        return index
+
+    def connect_server(self):
+        """连接标注服务（label_server），之后以瘦客户端方式工作"""
+        from label_server import DEFAULT_PORT, LabelClient  # urllib/ssl 导入较慢，用到时再导入
+        url, ok = QInputDialog.getText(self, "Connect Server", "Server URL:",
+                                       text=f"http://127.0.0.1:{DEFAULT_PORT}")
+        if not (ok and url):
+            return
+        try:
+            client = LabelClient(url)
+            self.wav_files = client.list_files()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to connect server: {str(e)}")
+            return
+        self.client = client
+        # 还在进行的本地后台解码不能再覆盖远程文件的显示
+        self.decode_generation += 1
+        self.audio_data = None
+        self.clear_labels()
+        self.current_file_index = -1
+        self.next_file()
+
     def load_audio_file(self, file_path):
         """加载单个音频文件"""
+        self.stop_review(reload=False)
+        self.stop_live()
+        self.close_timeline()
+        if self.client is not None:
+            return self.load_remote_file(file_path)
+        try:
+            self.file_path = file_path
+            try:
+                self.labels_version = label_file_version(label_json_path(file_path))
+            except ValueError:  # 损坏的标注文件
+                self.labels_version = 0
+            self.decode_generation += 1
+            self.peaks = WaveformPeaks.load(file_path)
+            if self.peaks is not None:
+                # 有有效的峰值文件：先绘制概览波形（放大时按窗口读取文件），完整解码和频谱图在后台线程计算。
+                # 在此之前上一个文件的频谱图和边界吸附都不能再用
+                self.audio_data = None
+                self.sample_rate = self.peaks.sample_rate
+                self.n_samples = self.peaks.n_samples
+                self.boundary_index = None
+                self.waveform_view.snap_func = None
+                self.play_btn.setEnabled(False)
+                self.spectrogram_view.clear_spectrogram()
+                self.waveform_view.set_peaks(self.peaks, self.read_samples)
+                self.waveform_view.autoRange()
+                self.time_slider.setRange(0, int(self.n_samples / self.sample_rate * 1000))
+                Thread(target=self.decode_in_background,
+                       args=(self.decode_generation, file_path, self.analysis_bandwidth), daemon=True).start()
+            else:
+                self.decode_audio(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(e)}")
+
+    def decode_audio(self, file_path):
+        """完整解码音频并显示（频谱图和播放需要全部采样）"""
+        if file_path != self.file_path:  # 解码前已切换到其他文件
+            return
         try:
             self.audio_data, self.sample_rate = sf.read(file_path)
             if len(self.audio_data.shape) > 1:
                 self.audio_data = self.audio_data[:, 0]
-            self.file_path = file_path
+            self.n_samples = len(self.audio_data)
+            self.display_audio()
+            self.build_boundary_index()
+            self.play_btn.setEnabled(True)
+            self.add_label_btn.setEnabled(True)
+            self.save_btn.setEnabled(True)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(e)}")
+
+    def decode_in_background(self, generation, file_path, bandwidth):
+        """工作线程：完整解码并计算频谱图，结果通过 audio_decoded 信号交回界面线程"""
+        try:
+            audio_data, sample_rate = sf.read(file_path, dtype='float32', always_2d=True)
+            audio_data = audio_data[:, 0]
+            image, extent, db_range = compute_spectrogram(audio_data, sample_rate, bandwidth=bandwidth)
+            self.audio_decoded.emit(generation, (audio_data, sample_rate, image, extent, db_range))
+        except Exception as e:
+            self.audio_decoded.emit(generation, e)
+
+    def on_audio_decoded(self, generation, result):
+        """后台解码完成：显示频谱图（保持当前视图范围）、建立边界索引并允许播放"""
+        # 解码期间已切换到其他文件，或进入了复核 / 拼接时间轴 / 实时模式
+        if (generation != self.decode_generation or self.review is not None or self.timeline is not None
+                or self.live is not None):
+            return
+        if isinstance(result, Exception):
+            QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(result)}")
+            return
+        self.audio_data, self.sample_rate, image, extent, db_range = result
+        self.n_samples = len(self.audio_data)
+        self.spectrogram_view.clear_detail_image()
+        self.spectrogram_view.set_spectrogram_image(image, extent, db_range, auto_range=False)
+        self.spectrogram_view.getViewBox().setRange(xRange=self.waveform_view.viewRange()[0],
+                                                    yRange=extent[2:], padding=0)
+        self.build_boundary_index()
+        self.play_btn.setEnabled(True)
+        self.add_label_btn.setEnabled(True)
+        self.save_btn.setEnabled(True)
+        # 换上新频谱图时叠加图像已隐藏，按当前视图重新计算
+        self.detail_timer.start(0)
+
+    def load_remote_file(self, name):
+        """瘦客户端模式：只取峰值和频谱图，不在本地解码音频"""
+        try:
+            self.file_path = name
+            # 读取标注时再取得实际版本号；读取失败时按 0 写入，服务端会拒绝覆盖已有的标注
+            self.labels_version = 0
+            self.decode_generation += 1
+            self.audio_data = None
+            self.peaks = self.client.get_peaks(name)
+            self.sample_rate = self.peaks.sample_rate
+            self.n_samples = self.peaks.n_samples
             self.display_audio()
+            self.build_boundary_index()
             self.play_btn.setEnabled(True)
             self.add_label_btn.setEnabled(True)
             self.save_btn.setEnabled(True)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(e)}")
 
+    def build_boundary_index(self):
+        """建立当前文件的边界候选索引（事件起止点、过零点），用于拖动选区时吸附"""
+        # 采样不在内存中时过零点按块在吸附时读取，不在加载时读取整个文件；瘦客户端模式下用小块
+        self.boundary_index = BoundaryIndex(self.peaks, self.read_samples,
+                                            precompute=self.client is None and self.audio_data is not None,
+                                            block=ZC_BLOCK if self.client is None else ZC_REMOTE_BLOCK)
+        self.waveform_view.snap_func = self.boundary_index.snap
+
+    def read_samples(self, start, stop):
+        """读取采样区间 [start, stop)，尚未完整解码时只按窗口读取文件"""
+        if self.client is not None:
+            return self.client.get_samples(self.file_path, start, stop)
+        if self.live is not None:
+            return self.live.source.read(start, stop)
+        if self.audio_data is not None:
+            return self.audio_data[start:stop]
+        with sf.SoundFile(self.file_path) as f:
+            f.seek(start)
+            return f.read(stop - start, always_2d=True)[:, 0]
+
     def prev_file(self):
         """加载下一首，自动保存当前文件的标注"""
+        if self.timeline is not None:
+            return self.step_timeline(-1)
         if self.labels:  # 如果有未保存的标注
             self.save_labels_auto()
         self.clear_labels()
 
         """加载上一首"""
         if self.wav_files:
-            if self.current_file_index > 0:
+            if self.shared_mode:
+                index = self.claim_file(self.current_file_index - 1, step=-1)
+                if index is None:
+                    return
+                self.current_file_index = index
+            elif self.current_file_index > 0:
                 self.current_file_index -= 1
             else:
                 self.current_file_index = len(self.wav_files) - 1
@@ -629,13 +1140,24 @@ class AudioLabeler(QMainWindow):
 
     def next_file(self):
         """加载下一首，自动保存当前文件的标注"""
+        if self.timeline is not None:
+            return self.step_timeline(1)
         if self.labels:  # 如果有未保存的标注
             self.save_labels_auto()
 
         self.clear_labels()
 
         if self.wav_files:
-            if self.current_file_index < len(self.wav_files) - 1:
+            # 瘦客户端模式下由服务端分配下一个未标注的文件
+            name = self.client.next_file() if self.client is not None else None
+            if name in self.wav_files:
+                self.current_file_index = self.wav_files.index(name)
+            elif self.shared_mode:
+                index = self.claim_file(self.current_file_index + 1)
+                if index is None:
+                    return
+                self.current_file_index = index
+            elif self.current_file_index < len(self.wav_files) - 1:
                 self.current_file_index += 1
             else:
                 self.current_file_index = 0
@@ -648,21 +1170,34 @@ class AudioLabeler(QMainWindow):
 
     def save_labels_auto(self):
         """自动保存标注（与音频文件同名但扩展名为.json）"""
+        if self.timeline is not None:
+            return self.save_timeline()
+        # 跳过重复文件时，被跳过的副本不会被打开，标注随代表文件一起写入
+        if self.skip_duplicates_action.isChecked() and self.file_path in self.duplicates:
+            self.propagate_labels(quiet=True)
         if not self.file_path: return 
-        if not self.labels:
+        # 尚未接受的预标注不自动保存（只是浏览文件夹时不能把模型输出写成标注），需要保留时用 Save Labels
+        labels = accepted_labels(self.labels)
+        if not labels:
             self.statusBar().showMessage("No audio file loaded, No labels added, Pre Label will be droped")
             return
 
-        json_path = os.path.splitext(self.file_path)[0] + '.json'
+        save_data = make_label_data(self.file_path, self.sample_rate,
+                                    self.n_samples / self.sample_rate, labels)
         try:
-            save_data = {
-                    "audio_file": self.file_path,
-                    "sample_rate": self.sample_rate,
-                    "duration/s": len(self.audio_data) / self.sample_rate,
-                    "labels": self.labels
-                }
-            with open(json_path, 'w') as f:
-                json.dump(save_data, f, indent=4)
+            if self.client is not None:
+                self.labels_version = self.client.put_labels(self.file_path, labels,
+                                                             version=self.labels_version)
+            else:
+                self.labels_version = write_label_file(label_json_path(self.file_path), save_data,
+                                                       expected_version=self.labels_version)
+        except LabelConflictError as e:
+            # 别人已修改过该文件：不覆盖，另存一份以免丢失本次标注（瘦客户端模式下存到本地当前目录）
+            conflict_path = os.path.splitext(self.file_path)[0] + f".conflict-{int(time.time())}.json"
+            if self.client is not None:
+                conflict_path = os.path.abspath(os.path.basename(conflict_path))
+            write_label_file(conflict_path, save_data)
+            QMessageBox.warning(self, "Warning", f"{str(e)}\nYour labels were saved to {conflict_path}")
         except Exception as e:
             print(f"Failed to auto-save labels: {str(e)}")
 
@@ -672,18 +1207,29 @@ class AudioLabeler(QMainWindow):
             self.statusBar().showMessage("No audio file loaded")
             return
         
-        json_path = os.path.splitext(self.file_path)[0] + '.json'
-        if os.path.exists(json_path):
+        json_path = label_json_path(self.file_path)
+        if self.client is not None or os.path.exists(json_path):
             try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                    self.labels = data.get('labels', [])
-                    self.display_labels()
+                if self.client is not None:
+                    data = self.client.get_labels(self.file_path)
+                else:
+                    data = read_label_file(json_path)
+                self.labels_version = data.get('version', 0)
+                self.labels = data.get('labels', [])
+                self.display_labels()
             except Exception as e:
                 self.statusBar().showMessage(f"Failed to load labels: {str(e)}")
                 print(f"Failed to load labels: {str(e)}")
         else:
             self.clear_labels()
+            # 还没有标注文件时，加载预标注插件已缓存的预测（Pre-label Folder 计算过的）
+            if self.prelabel_key and self.client is None:
+                from prelabel import as_proposals
+                cache = self.get_prelabel_cache(self.folder_path or os.path.dirname(self.file_path))
+                regions = cache.get(self.file_path) if cache is not None else None
+                if regions:
+                    self.labels = as_proposals(regions)
+                    self.display_labels()
         
     def update_nav_buttons(self):
         """更新导航按钮状态"""
@@ -691,7 +1237,10 @@ class AudioLabeler(QMainWindow):
         self.next_btn.setEnabled(len(self.wav_files) > 0) #  and self.current_file_index < len(self.wav_files) - 1)
         # 更新窗口标题显示当前文件位置
         if self.wav_files:
-            self.setWindowTitle(f"PyAudioLabeler - {self.current_file_index + 1}/{len(self.wav_files)}: {os.path.basename(self.file_path)}")
+            title = f"PyAudioLabeler - {self.current_file_index + 1}/{len(self.wav_files)}: {os.path.basename(self.file_path)}"
+            if self.file_path in self.duplicates:
+                title += f" (+{len(self.duplicates[self.file_path]) - 1} duplicates)"
+            self.setWindowTitle(title)
 
     def display_labels(self):
         # 清除之前的标签显示
@@ -700,17 +1249,21 @@ class AudioLabeler(QMainWindow):
                 self.waveform_view.removeItem(item)
         # 添加新的标签区域
         for index, label in enumerate( self.labels ):
+            proposal = label.get("proposal")
+            text = f"{label['start']:.6f}-{label['end']:.6f}: {label['label']}"
+            if proposal:
+                text = f"[? {label.get('score', 0):.2f}] " + text
             start, end, label = label["start"], label["end"], label["label"]
 
             region = pg.LinearRegionItem(values=[start, end])
 
-            # # 在波形上显示标签区域
-            region.setBrush(QBrush(QColor(0, 255, 0, 50)))
+            # # 在波形上显示标签区域，待复核的预标注用橙色
+            region.setBrush(QBrush(QColor(255, 140, 0, 60) if proposal else QColor(0, 255, 0, 50)))
             region.setZValue(5)
             self.waveform_view.addItem(region)
 
             # # 添加到列表控件
-            item = QListWidgetItem(f"{start:.6f}-{end:.6f}: {label}")
+            item = QListWidgetItem(text)
             item.setData(Qt.UserRole, index)
             self.label_list.addItem(item)
             
@@ -725,36 +1278,27 @@ class AudioLabeler(QMainWindow):
         )
         
         if file_path:
-            self.file_path = file_path
-            try:
-                # 使用soundfile读取音频数据
-                self.audio_data, self.sample_rate = sf.read(file_path)
+            self.load_audio_file(file_path)
 
-                # 如果是立体声，取左声道
-                if len(self.audio_data.shape) > 1:
-                    self.audio_data = self.audio_data[:, 0]
-                
-                self.display_audio()
-                self.play_btn.setEnabled(True)
-                self.add_label_btn.setEnabled(True)
-                self.save_btn.setEnabled(True)
-
-                # 清除旧标签
-                self.clear_labels()
-                
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(e)}")
+            # 清除旧标签
+            self.clear_labels()
     
     def display_audio(self):
-        # 计算时间轴
-        duration = len(self.audio_data) / self.sample_rate
-        time_axis = np.linspace(0, duration, len(self.audio_data))
+        duration = self.n_samples / self.sample_rate
 
         # 计算并显示频谱图
         # self.audio_player.set_audio(self.audio_data, self.sample_rate)
 
+        # 首次解码时生成峰值文件，下次打开可直接绘制概览
+        if self.peaks is None:
+            self.peaks = WaveformPeaks.from_audio(self.audio_data, self.sample_rate)
+            try:
+                self.peaks.save(self.file_path)
+            except OSError as e:
+                print(f"Failed to write peak file: {str(e)}")
+
         # 更新波形显示
-        self.waveform_view.set_waveform(time_axis, self.audio_data)
+        self.waveform_view.set_peaks(self.peaks, self.read_samples)
         
         # 计算并显示频谱图
         self.display_spectrogram()
@@ -767,60 +1311,137 @@ class AudioLabeler(QMainWindow):
         self.time_slider.setRange(0, int(duration * 1000))
 
     def display_spectrogram(self):
-        """使用 NumPy 计算稳定的频谱图"""
-        # STFT参数
-        n_fft = (self.sample_rate // 1000) * 1 # 8ms
-        hop_length = n_fft // 2
-
-        print(f"n_fft: {n_fft}, hop_length: {hop_length}, self.sample_rate : {self.sample_rate}")
-
-        # 设置显示范围
-        max_freq = self.sample_rate / 2
-        duration = len( self.audio_data ) / self.sample_rate
-        extent = (0, duration, 0, max_freq)
-
-        TYPE = 1
-        if TYPE==1 or TYPE==2:
-            stft = librosa.stft(self.audio_data.astype(np.float32), n_fft=n_fft, hop_length=hop_length)
-            # 1. 使用librosa计算de频谱图 Good
-            spectrogram = librosa.amplitude_to_db(np.abs(stft), ref=np.max)
-            # spectrogram -= spectrogram.min()
-
-            if TYPE==2:
-                # 2. Mel滤波器组 
-                mel_filter = librosa.filters.mel(sr=self.sample_rate, n_fft=n_fft, n_mels=80)
-                mel_spectrogram = np.dot(mel_filter, np.abs(stft) ** 2)  # 功率谱 → Mel谱
-                spectrogram = librosa.power_to_db(mel_spectrogram, ref=np.max)  # Log压缩
+        """计算并显示频谱图"""
+        if self.client is not None:
+            image, extent, db_range = self.client.get_spectrogram(self.file_path, bandwidth=self.analysis_bandwidth)
+        else:
+            image, extent, db_range = compute_spectrogram(self.audio_data, self.sample_rate,
+                                                          bandwidth=self.analysis_bandwidth)
+        self.spectrogram_view.clear_detail_image()
+        self.spectrogram_view.set_spectrogram_image(image, extent, db_range)
+
+    def contrast_changed(self, *args):
+        """对比度滑块变化：只重映射频谱图的查找表"""
+        self.spectrogram_view.set_contrast(self.floor_slider.value(), self.ceiling_slider.value(),
+                                           self.gamma_slider.value() / 100)
+
+    def auto_contrast(self):
+        """按当前频谱图的 dB 直方图自动设置下限 / 上限"""
+        levels = self.spectrogram_view.auto_contrast()
+        if levels is None:
+            return
+        for slider, value in zip((self.floor_slider, self.ceiling_slider), levels):
+            slider.blockSignals(True)
+            slider.setValue(int(round(value)))
+            slider.blockSignals(False)
+
+    def set_analysis_bandwidth(self):
+        """设置分析带宽，高采样率音频只按该带宽计算频谱图"""
+        current = (self.analysis_bandwidth or 0) / 1000
+        value, ok = QInputDialog.getDouble(self, "Analysis Bandwidth",
+                                           "Highest frequency to analyse in kHz (0 = full band):",
+                                           current, 0, 1000, 1)
+        if not ok:
+            return
+        self.analysis_bandwidth = value * 1000 or None
+        if self.audio_data is not None or self.client is not None:
+            self.display_spectrogram()
+
+    def update_view_images(self):
+        """视图范围改变后（防抖）：在界面线程中决定需要哪些叠加图像，计算交给后台线程"""
+        self.view_generation += 1
+        self.update_spectrogram_detail()
+        self.update_band_zoom()
+
+    def submit_view_job(self, kind, compute):
+        """把叠加图像的计算 compute()（返回 (图像, extent)）交给后台线程，替换同一种类还没开始的请求"""
+        with self.view_jobs_lock:
+            self.view_jobs[kind] = (self.view_generation, self.spectrogram_view.image_generation, compute)
+        self.view_jobs_event.set()
+        if self.view_worker is None:
+            self.view_worker = Thread(target=self.run_view_jobs, daemon=True)
+            self.view_worker.start()
+
+    def run_view_jobs(self):
+        """工作线程：依次计算最新的叠加图像请求，结果通过 view_image_ready 信号交回界面线程"""
+        while True:
+            self.view_jobs_event.wait()
+            self.view_jobs_event.clear()
+            with self.view_jobs_lock:
+                jobs, self.view_jobs = self.view_jobs, {}
+            for kind, (generation, image_generation, compute) in jobs.items():
+                if generation != self.view_generation:  # 视图已经又变了，不必再算
+                    continue
+                try:
+                    result = compute()
+                except Exception as e:
+                    result = e
+                self.view_image_ready.emit(generation, image_generation, kind, result)
+
+    def on_view_image_ready(self, generation, image_generation, kind, result):
+        """后台叠加图像完成：视图范围和频谱图都没有变化时才显示"""
+        view = self.spectrogram_view
+        if generation != self.view_generation or image_generation != view.image_generation:
+            return
+        if isinstance(result, Exception):
+            print(f"Failed to compute {kind} image: {str(result)}")
+            return
+        image, extent = result
+        if kind == "detail":
+            view.set_detail_image(image, extent)
+        else:
+            view.set_band_image(image, extent)
 
+    def update_spectrogram_detail(self):
+        """按带宽降采样显示时，若视图足够短则在后台按原始采样率计算该时间窗的频谱细节"""
+        view = self.spectrogram_view
+        if self.audio_data is None or decimation_factor(self.sample_rate, self.analysis_bandwidth) == 1:
+            view.clear_detail_image()
+            return
+        x0, x1 = view.viewRange()[0]
+        if x1 - x0 > FULL_RATE_WINDOW:
+            view.clear_detail_image()
+            return
+        start = max(int(x0 * self.sample_rate), 0)
+        stop = min(int(np.ceil(x1 * self.sample_rate)), self.n_samples)
+        if stop - start < self.sample_rate // 100:  # 不足 10ms
+            return
+        samples, sample_rate = self.audio_data[start:stop], self.sample_rate
+        self.submit_view_job("detail", lambda: compute_spectrogram(samples, sample_rate,
+                                                                   offset=start / sample_rate)[:2])
+
+    def update_band_zoom(self):
+        """频谱图纵轴放大到窄频带时，在后台只为该频带和当前时间窗计算高分辨率频谱（外差 + 抽取）并叠加显示"""
+        view = self.spectrogram_view
+        if not self.n_samples or self.live is not None:
+            view.clear_band_image()
+            return
+        if view.extent is None:
+            view.clear_band_image()
+            return
+        (x0, x1), (y0, y1) = view.viewRange()
+        # 与显示的频谱图的频率范围比较（按分析带宽降采样时低于原始奈奎斯特频率），否则载入后的默认视图就被当作窄频带
+        top = view.extent[3]
+        y0, y1 = max(y0, 0.0), min(y1, self.sample_rate / 2)
+        if y1 <= y0 or y1 - y0 > top * BAND_ZOOM_FRACTION or x1 - x0 > BAND_ZOOM_WINDOW:
+            view.clear_band_image()
+            return
+        start = max(int(x0 * self.sample_rate), 0)
+        stop = min(int(np.ceil(x1 * self.sample_rate)), self.n_samples)
+        if stop - start < self.sample_rate // 100:  # 不足 10ms
+            return
+        sample_rate = self.sample_rate
+        if self.audio_data is not None:
+            samples = self.audio_data[start:stop]
+            read = lambda: samples
         else:
-            audio_mono = self.audio_data.astype(np.float32)
-            audio_mono = audio_mono / np.max(np.abs(audio_mono))  # 归一化到[-1,1]
-
-            # 使用NumPy手动计算STFT
-            window = np.hanning(n_fft)
-            stft = np.array([
-                np.fft.rfft(window * audio_mono[i: i+n_fft], n=n_fft) for i in range(0, len(audio_mono)-n_fft, hop_length)
-            ]).T  # 转置得到 (频率bins, 时间帧)
-
-            def amplitude_to_db_numpy(S, ref=1.0, amin=1e-9, top_db=80.0, power=True):
-                # 1. 确保输入为正值，并应用最小阈值
-                magnitude = np.abs(S) if not power else np.abs(S) ** 2
-                magnitude = np.maximum(magnitude, amin)
-                # 2. 计算对数能量（分贝）
-                log_spec = 10 * np.log10(magnitude) if power else 20 * np.log10(magnitude)
-                # 3. 相对参考值归一化
-                log_spec -= 10 * np.log10(ref) if power else 20 * np.log10(ref)
-                # 4. 动态范围限制（可选）
-                if top_db is not None:
-                    log_spec = np.maximum(log_spec, log_spec.max() - top_db)
-                return log_spec
-
-            spectrogram = amplitude_to_db_numpy(stft)
-
-        self.spectrogram_view.set_spectrogram(spectrogram - np.nanmin(spectrogram), extent)
+            # 峰值文件快速路径 / 瘦客户端：在后台线程中按窗口读取文件或向服务端请求
+            read = lambda: self.read_samples(start, stop)
+        self.submit_view_job("band", lambda: band_spectrogram(read(), sample_rate, y0, y1,
+                                                              offset=start / sample_rate)[:2])
 
     def play_audio(self):
-        if self.audio_data is None:
+        if not self.n_samples:
             return
 
         # 获取当前选择区域
@@ -833,7 +1454,7 @@ class AudioLabeler(QMainWindow):
             playback_duration = (end_sample - self.playback_start_pos) / self.sample_rate
         else:
             self.playback_start_pos = 0
-            playback_duration = len(self.audio_data) / self.sample_rate
+            playback_duration = self.n_samples / self.sample_rate
             
         # 设置播放位置
         self.time_slider.setValue(int(self.playback_start_pos / self.sample_rate * 1000))
@@ -867,7 +1488,7 @@ class AudioLabeler(QMainWindow):
                 self.stop_audio()
                 return
         
-        if new_pos >= len(self.audio_data):
+        if new_pos >= self.n_samples:
             self.stop_audio()
             return
             
@@ -1055,6 +1676,568 @@ class AudioLabeler(QMainWindow):
         self.edit_label_btn.setEnabled(False)
         self.delete_label_btn.setEnabled(False)
 
+    def import_labels(self):
+        """导入第三方格式的标注（Audacity 标签轨、Praat TextGrid、RTTM、CSV、JSON），追加到当前标注"""
+        from label_convert import format_for_path, read_labels, read_rttm
+
+        if not self.file_path:
+            QMessageBox.warning(self, "Warning", "Please open an audio file first")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Import Labels", os.path.dirname(self.file_path),
+            "Label Files (*.json *.txt *.TextGrid *.rttm *.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            if format_for_path(file_path) == "rttm":
+                # RTTM 可能包含多个文件，优先只取当前音频的行
+                file_id = os.path.splitext(os.path.basename(self.file_path))[0]
+                data = read_rttm(file_path, file_id=file_id)
+                if not data["labels"]:
+                    data = read_rttm(file_path)
+            else:
+                data = read_labels(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to import labels: {str(e)}")
+            return
+
+        self.labels.extend({"start": label["start"], "end": label["end"], "label": label["label"]}
+                           for label in data["labels"])
+        self.waveform_view.clear_label_regions()
+        self.label_list.clear()
+        self.display_labels()
+        self.statusBar().showMessage(f"Imported {len(data['labels'])} labels from {os.path.basename(file_path)}")
+
+    def tighten_labels(self):
+        """把所有标注的起止点收紧到 TIGHTEN_WINDOW 内最近的事件边界和过零点"""
+        if self.boundary_index is None or not self.labels:
+            return
+        for label in self.labels:
+            label["start"], label["end"] = self.boundary_index.tighten(label["start"], label["end"], TIGHTEN_WINDOW)
+        self.waveform_view.clear_label_regions()
+        self.label_list.clear()
+        self.display_labels()
+        self.statusBar().showMessage(f"Tightened {len(self.labels)} labels")
+
+    def find_similar(self):
+        """在整个文件夹中查找与选中区域相似的片段，结果显示在候选列表中"""
+        from similarity import SimilarityIndex, build_index, embed
+
+        selection = self.waveform_view.get_selection()
+        if not selection or not self.file_path:
+            QMessageBox.warning(self, "Warning", "Please select a region first")
+            return
+        if self.client is not None:
+            QMessageBox.warning(self, "Warning", "Similarity search works on local folders only")
+            return
+        folder_path = self.folder_path or os.path.dirname(self.file_path)
+
+        if self.similarity_index is None:
+            self.similarity_index = SimilarityIndex.load(folder_path)
+        if self.similarity_index is None:
+            reply = QMessageBox.question(self, "Find Similar",
+                                         f"No similarity index for {folder_path}. Build it now?")
+            if reply != QMessageBox.Yes:
+                return
+            self.statusBar().showMessage("Building similarity index...")
+            QApplication.processEvents()
+            self.similarity_index = build_index(folder_path, log=lambda msg: None)
+
+        start, end = selection
+        samples = self.read_samples(max(int(start * self.sample_rate), 0),
+                                    min(int(end * self.sample_rate), self.n_samples))
+        results = self.similarity_index.query(embed(samples, self.sample_rate), k=50,
+                                              exclude=(self.file_path, start, end))
+
+        self.candidate_list.clear()
+        for score, path, c_start, c_end, label in results:
+            text = f"{score:.3f}  {os.path.relpath(path, folder_path)}  {c_start:.3f}-{c_end:.3f}"
+            item = QListWidgetItem(text + (f": {label}" if label else ""))
+            item.setData(Qt.UserRole, (path, c_start, c_end))
+            self.candidate_list.addItem(item)
+        self.candidate_list.show()
+        self.statusBar().showMessage(f"{len(results)} similar segments in {len(self.similarity_index)} indexed")
+
+    def on_candidate_double_clicked(self, item):
+        """双击候选片段：打开对应文件并选中该区域"""
+        path, start, end = item.data(Qt.UserRole)
+        self.jump_to(path, start, end)
+
+    def jump_to(self, file_path, start, end):
+        """跳转到某个文件的某段区域（需要时先自动保存当前标注并切换文件），并选中该区域"""
+        if os.path.abspath(file_path) != os.path.abspath(self.file_path or ""):
+            if self.labels:
+                self.save_labels_auto()
+            self.clear_labels()
+            if file_path in self.wav_files:
+                self.current_file_index = self.wav_files.index(file_path)
+            self.load_audio_file(file_path)
+            self.load_labels_auto()
+            self.update_nav_buttons()
+
+        for view in (self.waveform_view, self.spectrogram_view):
+            view.getViewBox().setXRange(start, end, padding=0.5)
+        self.waveform_view.selection_start, self.waveform_view.selection_end = start, end
+        self.waveform_view.update_selection_rect()
+        self.on_selection_changed(start, end)
+
+    def choose_prelabel_model(self):
+        """询问预标注插件，返回是否已选定"""
+        spec, ok = QInputDialog.getText(self, "Pre-label", "Model plugin (module:function or file.py:function):",
+                                        text=self.prelabel_model or "prelabel:energy_detector")
+        if not ok or not spec.strip():
+            return False
+        from prelabel import model_info
+        try:
+            key = model_info(spec.strip())[0]
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load pre-label model: {str(e)}")
+            return False
+        if key != self.prelabel_key:
+            self.prelabel_cache = None
+        self.prelabel_model, self.prelabel_key = spec.strip(), key
+        return True
+
+    def get_prelabel_cache(self, folder_path):
+        """当前插件在 folder_path 的预测缓存（同一文件夹只读取一次），读取失败时返回 None"""
+        from prelabel import PrelabelCache
+        if self.prelabel_cache is None or self.prelabel_cache.folder_path != folder_path:
+            try:
+                self.prelabel_cache = PrelabelCache(folder_path, self.prelabel_key)
+            except (OSError, ValueError) as e:
+                print(f"Failed to read pre-label cache: {str(e)}")
+                self.prelabel_cache = None
+        return self.prelabel_cache
+
+    def prelabel_file(self):
+        """用插件模型预标注当前文件，预测追加为待复核标注"""
+        from prelabel import as_proposals, run_model
+
+        if not self.file_path or self.client is not None or self.timeline is not None or self.live is not None:
+            QMessageBox.warning(self, "Warning", "Please open a local audio file first")
+            return
+        if not self.choose_prelabel_model():
+            return
+        self.statusBar().showMessage("Running pre-label model...")
+        QApplication.processEvents()
+        try:
+            folder_path = self.folder_path or os.path.dirname(self.file_path)
+            results = run_model(self.prelabel_model, [self.file_path], folder_path, log=lambda msg: None,
+                                cache=self.get_prelabel_cache(folder_path))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Pre-label model failed: {str(e)}")
+            return
+        existing = {(label["start"], label["end"], str(label["label"])) for label in self.labels}
+        proposals = [label for label in as_proposals(results.get(self.file_path, []))
+                     if (label["start"], label["end"], label["label"]) not in existing]
+        self.labels.extend(proposals)
+        self.waveform_view.clear_label_regions()
+        self.label_list.clear()
+        self.display_labels()
+        self.statusBar().showMessage(f"{len(proposals)} proposals from {self.prelabel_model}")
+
+    def prelabel_folder(self):
+        """用插件模型预标注整个文件夹（结果缓存，之后打开还没有标注文件的音频时作为待复核标注加载）"""
+        from prelabel import run_model
+
+        if not self.folder_path or self.client is not None:
+            QMessageBox.warning(self, "Warning", "Please open a local folder first")
+            return
+        if not self.choose_prelabel_model():
+            return
+
+        def log(msg):
+            self.statusBar().showMessage(msg)
+            QApplication.processEvents()
+
+        try:
+            results = run_model(self.prelabel_model, sorted(find_wav_files(self.folder_path)), self.folder_path,
+                                log=log, cache=self.get_prelabel_cache(self.folder_path))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Pre-label model failed: {str(e)}")
+            return
+        self.statusBar().showMessage(f"Pre-labeled {len(results)} files, "
+                                     f"{sum(len(r) for r in results.values())} regions")
+        if self.file_path and not self.labels and self.timeline is None:
+            self.load_labels_auto()
+
+    def accept_proposal(self, all_proposals=False):
+        """接受选中的（或全部）待复核预标注，转为普通标注；拒绝用 Delete Label"""
+        if all_proposals:
+            indices = range(len(self.labels))
+        elif self.label_list.currentItem():
+            indices = [self.label_list.currentItem().data(Qt.UserRole)]
+        else:
+            return
+        accepted = 0
+        for index in indices:
+            if index < len(self.labels) and self.labels[index].pop("proposal", None):
+                self.labels[index].pop("score", None)
+                accepted += 1
+        if accepted:
+            row = self.label_list.currentRow()
+            self.waveform_view.clear_label_regions()
+            self.label_list.clear()
+            self.display_labels()
+            self.label_list.setCurrentRow(min(row + 1, self.label_list.count() - 1))
+        self.statusBar().showMessage(f"Accepted {accepted} proposals")
+
+    def set_skip_duplicates(self, enabled):
+        """按指纹索引把重复 / 近似重复的文件分组，导航时每组只显示代表文件"""
+        from fingerprint import build_index
+
+        current = self.file_path
+        if not enabled:
+            self.wav_files = sorted(find_wav_files(self.folder_path)) if self.folder_path else self.wav_files
+        else:
+            if not self.folder_path or self.client is not None:
+                QMessageBox.warning(self, "Warning", "Please open a local folder first")
+                self.skip_duplicates_action.setChecked(False)
+                return
+            # 索引按文件大小和修改时间增量更新，只为新增或改动过的文件计算指纹
+            self.statusBar().showMessage("Fingerprinting files...")
+            QApplication.processEvents()
+            index = build_index(self.folder_path, log=lambda msg: None)
+            groups = index.duplicate_groups()
+            self.duplicates = {path: group for group in groups for path in group}
+            self.duplicate_versions = {}
+            for path in self.duplicates:
+                json_path = label_json_path(path)
+                try:
+                    data = read_label_file(json_path) if os.path.exists(json_path) else {}
+                except (OSError, ValueError):
+                    continue
+                if not accepted_labels(data.get("labels", [])):
+                    self.duplicate_versions[path] = data.get("version", 0)
+            redundant = {path for group in groups for path in group[1:]}
+            self.wav_files = [path for path in self.wav_files if path not in redundant]
+            self.statusBar().showMessage(f"{len(groups)} duplicate groups, {len(redundant)} files skipped")
+        if current in self.wav_files:
+            self.current_file_index = self.wav_files.index(current)
+        elif current in self.duplicates and self.duplicates[current][0] in self.wav_files:
+            self.current_file_index = self.wav_files.index(self.duplicates[current][0])
+        else:
+            self.current_file_index = min(self.current_file_index, max(len(self.wav_files) - 1, 0))
+        if self.file_path:
+            self.update_nav_buttons()
+
+    def propagate_labels(self, quiet=False):
+        """
+        把当前文件的标注复制到它的重复文件：完全相同或时长相差不超过 10ms 的近似重复才复制
+        （时长不同的近似重复可能有平移，标注时间对不上）。只写入分组时还没有标注、或之后由本实例写入的副本，
+        按记录的版本号检查，副本已被他人标注时跳过，不覆盖。尚未接受的预标注不复制
+        """
+        group = self.duplicates.get(self.file_path)
+        labels = accepted_labels(self.labels)
+        if not group or not labels:
+            if not quiet:
+                QMessageBox.information(self, "Copy Labels", "No duplicates of this file or no labels")
+            return
+        from fingerprint import FingerprintIndex
+        index = FingerprintIndex.load(self.folder_path)
+        duration = self.n_samples / self.sample_rate
+        copied, skipped = 0, []
+        for path in group:
+            if path == self.file_path:
+                continue
+            if not (index.is_exact_duplicate(self.file_path, path) or abs(index.duration_of(path) - duration) <= 0.01):
+                skipped.append(os.path.basename(path))
+                continue
+            if path not in self.duplicate_versions:  # 副本已有自己的标注
+                skipped.append(os.path.basename(path) + " (labeled)")
+                continue
+            json_path = label_json_path(path)
+            try:
+                self.duplicate_versions[path] = write_label_file(
+                    json_path, make_label_data(path, self.sample_rate, duration, labels),
+                    expected_version=self.duplicate_versions[path])
+                copied += 1
+            except LabelConflictError as e:
+                # 分组之后有人标注了该副本：以后也不再写入
+                del self.duplicate_versions[path]
+                skipped.append(os.path.basename(path) + " (labeled)")
+                print(f"Not copying labels to {path}: {str(e)}")
+            except (OSError, ValueError) as e:
+                skipped.append(os.path.basename(path))
+                print(f"Failed to copy labels to {path}: {str(e)}")
+        message = f"Copied labels to {copied} duplicates"
+        if skipped:
+            message += f", skipped {', '.join(skipped)}"
+        if quiet:
+            self.statusBar().showMessage(message)
+        else:
+            QMessageBox.information(self, "Copy Labels", message)
+
+    def set_timeline_mode(self, enabled):
+        """切换拼接时间轴模式：从当前文件开始，把 TIMELINE_FILES 个文件首尾相接显示"""
+        if enabled == (self.timeline is not None):
+            return
+        if not enabled:
+            self.save_timeline()
+            self.clear_labels()
+            self.load_audio_file(self.wav_files[self.current_file_index])
+            self.load_labels_auto()
+            self.update_nav_buttons()
+            return
+        if not self.wav_files or self.client is not None:
+            QMessageBox.warning(self, "Warning", "Please open a local folder first")
+            self.timeline_action.setChecked(False)
+            return
+        if self.labels:
+            self.save_labels_auto()
+        self.stop_review()
+        self.stop_live()
+        self.load_timeline(self.current_file_index)
+
+    def load_timeline(self, first_index):
+        """拼接 wav_files[first_index:] 开始的一页文件：一次解码、一次计算波形摘要和频谱图"""
+        from timeline import Timeline
+
+        try:
+            timeline = Timeline.load(self.wav_files, first_index)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load files: {str(e)}")
+            self.close_timeline()
+            return
+        self.clear_labels()
+        self.close_timeline()
+        self.timeline = timeline
+        self.timeline_action.setChecked(True)
+        self.current_file_index = first_index
+
+        # 时间轴不对应单个文件：file_path 置空，峰值摘要直接在内存中计算，不写峰值文件
+        self.file_path = None
+        self.audio_data = timeline.audio
+        self.sample_rate = timeline.sample_rate
+        self.n_samples = len(timeline.audio)
+        self.peaks = WaveformPeaks.from_audio(self.audio_data, self.sample_rate)
+        self.display_audio()
+        self.build_boundary_index()
+
+        # 文件分隔线
+        for start, path in zip(timeline.starts(), timeline.paths):
+            line = pg.InfiniteLine(start, angle=90, pen=pg.mkPen((255, 255, 255, 120), style=Qt.DashLine),
+                                   label=os.path.basename(path), labelOpts={'position': 0.95, 'color': 'w'})
+            self.waveform_view.addItem(line)
+            self.timeline_lines.append((self.waveform_view, line))
+            line = pg.InfiniteLine(start, angle=90, pen=pg.mkPen((255, 255, 255, 120), style=Qt.DashLine))
+            self.spectrogram_view.addItem(line)
+            self.timeline_lines.append((self.spectrogram_view, line))
+
+        self.labels = timeline.absolute_labels()
+        self.display_labels()
+        self.play_btn.setEnabled(True)
+        self.add_label_btn.setEnabled(True)
+        self.save_btn.setEnabled(True)
+        self.prev_btn.setEnabled(True)
+        self.next_btn.setEnabled(True)
+        self.setWindowTitle(f"PyAudioLabeler - {first_index + 1}-{timeline.end_index}/{len(self.wav_files)}: "
+                            f"{len(timeline)} files")
+
+    def step_timeline(self, step):
+        """保存当前页并切换到下一页 / 上一页"""
+        self.save_timeline()
+        timeline = self.timeline
+        if step > 0:
+            first_index = timeline.end_index if timeline.end_index < len(self.wav_files) else 0
+        else:
+            first_index = max(timeline.first_index - len(timeline), 0)
+        self.load_timeline(first_index)
+
+    def save_timeline(self):
+        """把时间轴上的标注拆回各文件，批量写入有改动的标注文件"""
+        if self.timeline is None:
+            return
+        try:
+            written, conflicts = self.timeline.save(self.labels)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save labels: {str(e)}")
+            return
+        if conflicts:
+            QMessageBox.warning(self, "Warning", "Some files were modified by someone else, your labels were saved to:\n"
+                                + "\n".join(conflicts))
+        self.statusBar().showMessage(f"Saved labels of {written} files")
+
+    def close_timeline(self):
+        """退出拼接时间轴模式（不保存），移除文件分隔线"""
+        for view, line in self.timeline_lines:
+            view.removeItem(line)
+        self.timeline_lines = []
+        self.timeline = None
+        self.timeline_action.blockSignals(True)
+        self.timeline_action.setChecked(False)
+        self.timeline_action.blockSignals(False)
+
+    def start_live(self):
+        """实时模式：跟踪一个仍在录音（不断追加）的 WAV 文件，增量更新波形和频谱图并自动滚动"""
+        from live import WavTail
+
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Recording", "", "WAV Files (*.wav);;All Files (*)")
+        if not file_path:
+            return
+        try:
+            tail = WavTail(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to open recording: {str(e)}")
+            return
+
+        if self.labels:
+            self.save_labels_auto()
+        self.stop_review()
+        self.stop_live()
+        self.close_timeline()
+        self.clear_labels()
+        self.live = tail
+        self.live_end = None
+        self.file_path = file_path
+        self.audio_data = None
+        self.peaks = None
+        self.sample_rate = tail.sample_rate
+        self.n_samples = tail.position
+        self.boundary_index = None
+        self.waveform_view.snap_func = None
+        self.waveform_view.waveform_plot.setSymbol(None)
+        self.play_btn.setEnabled(False)
+        self.add_label_btn.setEnabled(True)
+        self.save_btn.setEnabled(True)
+        # 标注按录音中的绝对时间保存在同名 .json 中
+        self.labels_version = label_file_version(label_json_path(file_path))
+        self.load_labels_auto()
+        self.setWindowTitle(f"PyAudioLabeler - Live: {os.path.basename(file_path)}")
+        self.update_live()
+        self.live_timer.start(LIVE_INTERVAL)
+
+    def update_live(self):
+        """读取新追加的采样，增量更新显示；视图右端贴着录音末尾时跟随滚动"""
+        if self.live is None or not self.live.poll():
+            return
+        source = self.live.source
+        self.n_samples = source.total
+        end = source.total / self.sample_rate
+
+        self.waveform_view.set_waveform(*source.envelope())
+        image, extent, db_range = source.spectrogram()
+        first = self.live_end is None
+        self.spectrogram_view.set_spectrogram_image(image, extent, db_range, auto_range=first)
+
+        x0, x1 = self.waveform_view.viewRange()[0]
+        if first or x1 >= self.live_end - 0.05 * (x1 - x0):
+            # 录音还不够 LIVE_VIEW_SECONDS 时从头显示，之后保持当前的视图宽度
+            width = LIVE_VIEW_SECONDS if first or x0 <= 0 else x1 - x0
+            for view in (self.waveform_view, self.spectrogram_view):
+                view.getViewBox().setXRange(max(end - width, 0), end, padding=0)
+        self.live_end = end
+        self.time_slider.setRange(0, int(end * 1000))
+
+    def stop_live(self):
+        """退出实时模式"""
+        if self.live is None:
+            return
+        self.live_timer.stop()
+        self.live = None
+        self.live_end = None
+
+    def start_review(self):
+        """复核模式：逐个显示文件夹中所有已有标注（只读取标注区域及上下文），单键接受 / 改标签 / 删除"""
+        from review import ReviewSession, build_review_queue
+
+        if self.client is not None:
+            QMessageBox.warning(self, "Warning", "Review works on local folders only")
+            return
+        folder_path = self.folder_path or QFileDialog.getExistingDirectory(self, "Select Folder to Review")
+        if not folder_path:
+            return
+        queue = build_review_queue(folder_path)
+        if not queue:
+            QMessageBox.information(self, "Review", "No unreviewed labels in this folder")
+            return
+
+        if self.labels:
+            self.save_labels_auto()
+        self.clear_labels()
+        self.stop_review()
+        self.stop_live()
+        self.close_timeline()
+        self.review = ReviewSession(queue, bandwidth=self.analysis_bandwidth)
+        for action in self.review_actions:
+            action.setEnabled(True)
+        self.show_review_item()
+
+    def show_review_item(self):
+        """显示复核队列中的当前片段（时间轴从窗口起点算起）"""
+        if self.review.finished():
+            counts = self.review.counts
+            self.stop_review()
+            QMessageBox.information(self, "Review", ", ".join(f"{k}: {v}" for k, v in counts.items()))
+            return
+        try:
+            item, segment = self.review.current()
+        except Exception as e:
+            self.statusBar().showMessage(f"Failed to load segment: {str(e)}")
+            self.review.decide("skip")
+            return self.show_review_item()
+
+        # 复核窗口不对应任何文件，file_path 置空以免自动保存覆盖标注文件
+        self.file_path = None
+        self.audio_data = segment["samples"]
+        self.sample_rate = segment["sample_rate"]
+        self.n_samples = len(self.audio_data)
+        self.peaks = segment["peaks"]
+        self.boundary_index = None
+        self.waveform_view.snap_func = None
+
+        self.clear_labels()
+        self.waveform_view.set_peaks(self.peaks, self.read_samples)
+        self.spectrogram_view.clear_detail_image()
+        self.spectrogram_view.set_spectrogram_image(segment["image"], segment["extent"], segment["db_range"])
+        start, end = item["start"] - segment["offset"], item["end"] - segment["offset"]
+        self.waveform_view.add_label_region(start, end, item["label"], color=QColor(0, 255, 0, 50))
+        for view in (self.waveform_view, self.spectrogram_view):
+            view.getViewBox().setXRange(0, self.n_samples / self.sample_rate, padding=0)
+        self.waveform_view.selection_start, self.waveform_view.selection_end = start, end
+        self.waveform_view.update_selection_rect()
+        self.play_btn.setEnabled(True)
+
+        position = self.review.position
+        self.setWindowTitle(f"PyAudioLabeler - Review {position + 1}/{len(self.review)}: "
+                            f"{os.path.basename(item['audio_path'])} {item['start']:.3f}-{item['end']:.3f}")
+        self.statusBar().showMessage(f"{item['label']}    [A] accept  [R] relabel  [X] reject  [N] skip  [Esc] stop")
+
+    def review_decide(self, decision):
+        """对当前复核片段作出决定并显示下一个"""
+        if self.review is None or self.review.finished():
+            return
+        new_label = None
+        if decision == "relabel":
+            item = self.review.queue[self.review.position]
+            new_label, ok = QInputDialog.getText(self, "Relabel", "Enter new label:", text=item["label"])
+            if not (ok and new_label):
+                return
+        try:
+            self.review.decide(decision, new_label)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save review: {str(e)}")
+            return
+        self.show_review_item()
+
+    def stop_review(self, reload=True):
+        """
+        退出复核模式
+        :param reload: 是否回到文件夹中的当前文件（切换文件时由调用方加载新文件）
+        """
+        if self.review is None:
+            return
+        self.review.close()
+        self.review = None
+        for action in self.review_actions:
+            action.setEnabled(False)
+        self.clear_labels()
+        if reload and self.wav_files:
+            self.load_audio_file(self.wav_files[self.current_file_index])
+            self.load_labels_auto()
+            self.update_nav_buttons()
+
     def save_labels(self):
         if not self.labels:
             QMessageBox.warning(self, "Warning", "No labels to save, writing to empty labels")
@@ -1063,7 +2246,7 @@ class AudioLabeler(QMainWindow):
         if not self.file_path:
             default_path = "labels.json"
         else:
-            default_path = os.path.splitext(self.file_path)[0] + ".json"
+            default_path = label_json_path(self.file_path)
             
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Save Labels", default_path, 
@@ -1072,21 +2255,26 @@ class AudioLabeler(QMainWindow):
         if file_path:
             try:
                 # 准备保存的数据
-                save_data = {
-                    "audio_file": self.file_path,
-                    "sample_rate": self.sample_rate,
-                    "duration": len(self.audio_data) / self.sample_rate,
-                    "labels": self.labels
-                }
-                
-                with open(file_path, 'w') as f:
-                    json.dump(save_data, f, indent=4)
-                    
+                save_data = make_label_data(self.file_path, self.sample_rate,
+                                            self.n_samples / self.sample_rate, self.labels,
+                                            duration_key="duration")
+                version = write_label_file(file_path, save_data)
+                # 保存到该音频的标注文件时记下新版本号，之后的自动保存不会与自己的保存冲突
+                if self.file_path and os.path.abspath(file_path) == os.path.abspath(label_json_path(self.file_path)):
+                    self.labels_version = version
+
                 QMessageBox.information(self, "Success", "Labels saved successfully")
                 
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to save labels: {str(e)}")
 
+    def closeEvent(self, event):
+        self.stop_live()
+        if self.review is not None:
+            self.review.close()
+        self.leases.release_all()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     import sys
 
@@ -1100,4 +2288,12 @@ if __name__ == "__main__":
 
     window = AudioLabeler()
     window.show()
+    app.processEvents()
+    startup_time = time.perf_counter() - _START_TIME
+    print(f"[AV_Labeller] window shown in {startup_time * 1000:.0f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)")
+    if "--startup-check" in sys.argv:
+        sys.exit(0 if startup_time <= STARTUP_BUDGET else 1)
+
+    # 窗口显示后在后台线程预热 librosa / scipy，第一次打开文件时不必再等待导入
+    Thread(target=warm_imports, daemon=True).start()
     sys.exit(app.exec_())
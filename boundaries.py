@@ -0,0 +1,133 @@
+"""
+标注边界吸附
+
+文件加载时为其建立边界候选索引：
+  * 事件起止点：由峰值文件的 RMS 包络做双阈值（迟滞）检测得到
+  * 过零点：采样符号变化的位置，边界落在过零点上剪切时不会产生爆音
+拖动选区时用二分查找把边界吸附到最近的候选上。
+"""
+import numpy as np
+
+# 事件检测的阈值：高于噪声底（RMS dB 的 10% 分位数）多少 dB 视为事件开始 / 结束
+ONSET_DB = 12.0
+OFFSET_DB = 6.0
+# 吸附到事件边界后，再在该范围（秒）内微调到最近的过零点
+ZC_REFINE = 0.002
+# 采样已在内存中且不超过该采样数时，加载时一次算出全部过零点；否则按块在需要时计算
+ZC_PRECOMPUTE_MAX = 1 << 25
+ZC_BLOCK = 1 << 20
+# reader 经网络读取（瘦客户端模式）时用更小的块，第一次吸附不必取回几十秒的采样
+ZC_REMOTE_BLOCK = 1 << 16
+
+
+def zero_crossings(y, offset=0):
+    """符号变化处的采样下标（取变化后的那个采样），升序"""
+    y = np.asarray(y)
+    return np.flatnonzero(np.signbit(y[:-1]) != np.signbit(y[1:])) + (1 + offset)
+
+
+def event_boundaries(peaks):
+    """
+    从峰值摘要的 RMS 包络检测事件起止时间
+    :return: (onsets, offsets) 两个升序的时间数组（秒）
+    """
+    # 选最接近 10ms 的层级
+    block = min(peaks.levels, key=lambda b: abs(b / peaks.sample_rate - 0.010))
+    rms = peaks.levels[block][2].astype(np.float32)
+    if len(rms) == 0:
+        return np.zeros(0), np.zeros(0)
+    db = 20 * np.log10(np.maximum(rms, 1e-6))
+    floor = np.percentile(db, 10)
+
+    # 迟滞：超过 ONSET_DB 进入事件，低于 OFFSET_DB 退出事件，两者之间保持前一个状态
+    state = np.where(db > floor + ONSET_DB, 1, np.where(db > floor + OFFSET_DB, -1, 0))
+    last = np.maximum.accumulate(np.where(state >= 0, np.arange(len(state)), 0))
+    active = state[last] == 1
+    change = np.flatnonzero(np.diff(active.astype(np.int8)))
+    onsets = (change[~active[change]] + 1) * block / peaks.sample_rate
+    offsets = (change[active[change]] + 1) * block / peaks.sample_rate
+    if active[0]:
+        onsets = np.concatenate([[0.0], onsets])
+    if active[-1]:
+        offsets = np.concatenate([offsets, [peaks.n_samples / peaks.sample_rate]])
+    return onsets, offsets
+
+
+def _nearest(sorted_values, x):
+    """升序数组中离 x 最近的值（二分查找），数组为空时返回 None"""
+    i = int(np.searchsorted(sorted_values, x))
+    best = None
+    for j in (i - 1, i):
+        if 0 <= j < len(sorted_values) and (best is None or abs(sorted_values[j] - x) < abs(best - x)):
+            best = sorted_values[j]
+    return best
+
+
+class BoundaryIndex:
+    """单个文件的边界候选索引"""
+
+    def __init__(self, peaks, reader, precompute=True, block=ZC_BLOCK):
+        """
+        :param peaks: peakfile.WaveformPeaks
+        :param reader: reader(start, stop) -> 单声道采样，用于计算过零点
+        :param precompute: 是否允许在加载时一次读取整个文件算出全部过零点；reader 要读磁盘或网络时
+                           应为 False，只在吸附时按块读取附近的采样
+        :param block: 按块计算过零点时每块的采样数
+        """
+        self.sample_rate = peaks.sample_rate
+        self.n_samples = peaks.n_samples
+        self.reader = reader
+        self.block = block
+        self.onsets, self.offsets = event_boundaries(peaks)
+        self.candidates = np.unique(np.concatenate([self.onsets, self.offsets]))
+
+        self._zc_blocks = {}
+        self.zero_crossings = None
+        if precompute and self.n_samples <= ZC_PRECOMPUTE_MAX:
+            self.zero_crossings = zero_crossings(reader(0, self.n_samples)).astype(np.int32)
+
+    def _zero_crossings_near(self, sample):
+        """sample 所在块（及相邻块）的过零点，长文件按块计算并缓存"""
+        if self.zero_crossings is not None:
+            return self.zero_crossings
+        block = sample // self.block
+        result = []
+        for b in (block - 1, block, block + 1):
+            if b < 0 or b * self.block >= self.n_samples:
+                continue
+            if b not in self._zc_blocks:
+                start = b * self.block
+                y = self.reader(start, min(start + self.block + 1, self.n_samples))
+                self._zc_blocks[b] = zero_crossings(y, offset=start)
+            result.append(self._zc_blocks[b])
+        return np.concatenate(result) if result else np.zeros(0, dtype=np.int64)
+
+    def snap_to_zero_crossing(self, t, tolerance):
+        """t 附近 tolerance 秒内最近的过零点，没有时原样返回"""
+        sample = int(round(t * self.sample_rate))
+        zc = _nearest(self._zero_crossings_near(sample), sample)
+        if zc is not None and abs(zc - sample) <= tolerance * self.sample_rate:
+            return float(zc / self.sample_rate)
+        return t
+
+    def snap(self, t, tolerance):
+        """
+        把时间 t 吸附到 tolerance 秒内最近的事件边界（再微调到过零点）；
+        附近没有事件边界时吸附到最近的过零点
+        """
+        boundary = _nearest(self.candidates, t)
+        if boundary is not None and abs(boundary - t) <= tolerance:
+            return self.snap_to_zero_crossing(boundary, min(tolerance, ZC_REFINE))
+        return self.snap_to_zero_crossing(t, tolerance)
+
+    def tighten(self, start, end, tolerance):
+        """收紧一个标注区间：起点吸附到事件起点，终点吸附到事件终点（都在 tolerance 秒内）"""
+        onset = _nearest(self.onsets, start)
+        if onset is not None and abs(onset - start) <= tolerance:
+            start = onset
+        offset = _nearest(self.offsets, end)
+        if offset is not None and abs(offset - end) <= tolerance:
+            end = offset
+        start = self.snap_to_zero_crossing(start, ZC_REFINE)
+        end = self.snap_to_zero_crossing(end, ZC_REFINE)
+        return float(min(start, end)), float(max(start, end))
@@ -0,0 +1,241 @@
+"""
+重复 / 近似重复文件检测
+
+为文件夹中每个文件计算两种指纹：
+  * 解码后 PCM 的分块流式哈希（blake2b），用于查找内容完全相同的文件（与编码、文件头无关）
+  * 频谱峰值对（landmark）哈希集合：重采样到 8kHz 后取对数频谱的局部峰值，两两配对为
+    (f1, f2, dt) 的 24 位哈希。重新编码、改变音量或截掉首尾后仍有一成以上的哈希相同（无关文件几乎为 0），用于查找近似重复
+用多进程计算，结果保存在 <folder>/.anlabeler/fingerprints.npz，文件未修改时下次直接复用。
+
+建立索引并列出重复文件：
+    python fingerprint.py <folder> [-j 8]
+"""
+import os
+import sys
+import hashlib
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import soundfile as sf
+
+from labelio import find_wav_files
+
+FP_RATE = 8000
+FP_N_FFT = 512
+FP_HOP = 256
+# 峰值检测的邻域（频率 bin 数、帧数）和每个锚点配对的峰值数
+PEAK_NEIGHBORHOOD = (15, 9)
+FAN_OUT = 5
+MAX_DT = 63
+# 近似重复：共同哈希数至少 NEAR_MIN_SHARED 个，且占较少一方的 NEAR_THRESHOLD 以上
+NEAR_THRESHOLD = 0.08
+NEAR_MIN_SHARED = 10
+# 出现在过多文件中的哈希（静音、纯音等）不参与比较
+MAX_POSTING = 32
+
+
+def index_path(folder_path):
+    return os.path.join(folder_path, '.anlabeler', 'fingerprints.npz')
+
+
+def landmark_hashes(y, sr):
+    """频谱峰值对哈希，升序去重的 uint32 数组"""
+    from scipy.ndimage import maximum_filter
+    from scipy.signal import resample_poly
+
+    y = np.asarray(y, dtype=np.float32)
+    if sr != FP_RATE:
+        g = np.gcd(int(sr), FP_RATE)
+        y = resample_poly(y, FP_RATE // g, int(sr) // g).astype(np.float32)
+    if len(y) < FP_N_FFT:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(y, FP_N_FFT)[::FP_HOP]
+    S = np.log(np.abs(np.fft.rfft(frames * np.hanning(FP_N_FFT).astype(np.float32), axis=1)) + 1e-6).T
+    peaks = (S == maximum_filter(S, size=PEAK_NEIGHBORHOOD)) & (S > S.mean() + S.std())
+    f, t = np.nonzero(peaks)
+    order = np.argsort(t, kind='stable')
+    f, t = f[order], t[order]
+
+    hashes = []
+    for k in range(1, FAN_OUT + 1):
+        f1, t1, f2, t2 = f[:-k], t[:-k], f[k:], t[k:]
+        dt = t2 - t1
+        ok = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((f1[ok].astype(np.uint32) << 15) | (f2[ok].astype(np.uint32) << 6) | dt[ok].astype(np.uint32))
+    return np.unique(np.concatenate(hashes))
+
+
+def _fingerprint_file(audio_path):
+    """工作进程：(路径, 大小, 修改时间, 时长, PCM 哈希, landmark 哈希)，失败时哈希为 None"""
+    try:
+        st = os.stat(audio_path)
+        digest = hashlib.blake2b(digest_size=16)
+        parts = []
+        with sf.SoundFile(audio_path) as f:
+            sr = f.samplerate
+            digest.update(np.int64(sr).tobytes())
+            for block in f.blocks(blocksize=1 << 16, dtype='float32', always_2d=True):
+                digest.update(np.ascontiguousarray(block).tobytes())
+                parts.append(block[:, 0].copy())
+        y = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        return (audio_path, st.st_size, st.st_mtime_ns, len(y) / sr, digest.hexdigest(),
+                landmark_hashes(y, sr))
+    except Exception as e:
+        print(f"[fingerprint] failed {audio_path}: {str(e)}")
+        return audio_path, 0, 0, 0.0, None, None
+
+
+class FingerprintIndex:
+    def __init__(self, folder_path, files, size, mtime_ns, duration, digest, hash_offsets, hashes):
+        self.folder_path = folder_path
+        self.files = [os.path.join(folder_path, p) for p in files]
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.duration = duration
+        self.digest = digest
+        self.hash_offsets = hash_offsets
+        self.hashes = hashes
+
+    def __len__(self):
+        return len(self.files)
+
+    @classmethod
+    def load(cls, folder_path):
+        """读取索引，不存在时返回 None"""
+        path = index_path(folder_path)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as npz:
+            return cls(folder_path, **{key: npz[key] for key in
+                                       ('files', 'size', 'mtime_ns', 'duration', 'digest', 'hash_offsets', 'hashes')})
+
+    def save(self):
+        path = index_path(self.folder_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, files=np.array([os.path.relpath(p, self.folder_path) for p in self.files], dtype=str),
+                     size=self.size, mtime_ns=self.mtime_ns, duration=self.duration, digest=self.digest,
+                     hash_offsets=self.hash_offsets, hashes=self.hashes)
+        os.replace(tmp_path, path)
+
+    def file_hashes(self, i):
+        return self.hashes[self.hash_offsets[i]:self.hash_offsets[i + 1]]
+
+    def _near_pairs(self, threshold, min_shared):
+        """共同 landmark 哈希足够多的文件对 (a, b)，用倒排表按哈希分组后向量化计数"""
+        n = len(self.files)
+        counts = np.diff(self.hash_offsets)
+        ids = np.repeat(np.arange(n), counts)
+        order = np.lexsort((ids, self.hashes))
+        h, ids = self.hashes[order], ids[order]
+        starts = np.flatnonzero(np.r_[True, h[1:] != h[:-1]])
+        sizes = np.diff(np.r_[starts, len(h)])
+
+        keys = []
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_POSTING)]):
+            members = ids[starts[sizes == size][:, None] + np.arange(size)]
+            a, b = np.triu_indices(size, 1)
+            keys.append((members[:, a].astype(np.int64) * n + members[:, b]).ravel())
+        if not keys:
+            return []
+        pairs, shared = np.unique(np.concatenate(keys), return_counts=True)
+        a, b = pairs // n, pairs % n
+        smaller = np.minimum(counts[a], counts[b])
+        ok = (shared >= min_shared) & (shared >= threshold * smaller)
+        return list(zip(a[ok].tolist(), b[ok].tolist()))
+
+    def duplicate_groups(self, threshold=NEAR_THRESHOLD, min_shared=NEAR_MIN_SHARED):
+        """
+        重复文件分组（完全相同或近似重复，传递合并）
+        :return: [[path, ...]]，只包含多于一个文件的组，组内按路径排序，第一个作为代表
+        """
+        parent = list(range(len(self.files)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first_with_digest = {}
+        for i, digest in enumerate(self.digest):
+            if digest:
+                j = first_with_digest.setdefault(digest, i)
+                parent[find(i)] = find(j)
+        for a, b in self._near_pairs(threshold, min_shared):
+            parent[find(a)] = find(b)
+
+        groups = {}
+        for i in range(len(self.files)):
+            groups.setdefault(find(i), []).append(self.files[i])
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    def is_exact_duplicate(self, path_a, path_b):
+        i, j = self.files.index(path_a), self.files.index(path_b)
+        return bool(self.digest[i]) and self.digest[i] == self.digest[j]
+
+    def duration_of(self, path):
+        return float(self.duration[self.files.index(path)])
+
+
+def build_index(folder_path, jobs=None, log=print):
+    """建立 / 更新索引（多进程），大小和修改时间未变的文件复用已有结果"""
+    files = sorted(find_wav_files(folder_path))
+    old = FingerprintIndex.load(folder_path)
+    cached = {}
+    if old is not None:
+        for i, path in enumerate(old.files):
+            cached[path] = (old.size[i], old.mtime_ns[i], old.duration[i], old.digest[i], old.file_hashes(i))
+
+    results = {}
+    todo = []
+    for path in files:
+        entry = cached.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            results[path] = entry
+        else:
+            todo.append(path)
+    if todo:
+        with Pool(jobs) as pool:
+            for path, size, mtime_ns, duration, digest, hashes in pool.imap_unordered(_fingerprint_file, todo,
+                                                                                       chunksize=8):
+                if digest is None:
+                    continue
+                results[path] = (size, mtime_ns, duration, digest, hashes)
+                log(f"[fingerprint] {path}: {len(hashes)} landmarks")
+
+    files = [path for path in files if path in results]
+    hashes = [results[path][4] for path in files]
+    hash_offsets = np.zeros(len(files) + 1, dtype=np.int64)
+    np.cumsum([len(h) for h in hashes], out=hash_offsets[1:])
+    index = FingerprintIndex(
+        folder_path, [os.path.relpath(p, folder_path) for p in files],
+        size=np.array([results[p][0] for p in files], dtype=np.int64),
+        mtime_ns=np.array([results[p][1] for p in files], dtype=np.int64),
+        duration=np.array([results[p][2] for p in files], dtype=np.float64),
+        digest=np.array([results[p][3] for p in files], dtype=str),
+        hash_offsets=hash_offsets,
+        hashes=np.concatenate(hashes).astype(np.uint32) if hashes else np.zeros(0, dtype=np.uint32))
+    index.save()
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建立指纹索引并列出重复 / 近似重复的文件")
+    parser.add_argument("folder")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为 CPU 核数")
+    args = parser.parse_args()
+    index = build_index(args.folder, args.jobs, log=lambda msg: None)
+    groups = index.duplicate_groups()
+    for group in groups:
+        print(" = ".join(os.path.relpath(p, args.folder) for p in group))
+    print(f"[fingerprint] {len(index)} files, {len(groups)} duplicate groups, "
+          f"{sum(len(g) - 1 for g in groups)} redundant files")
+    sys.exit(0)
@@ -0,0 +1,396 @@
+"""
+标注格式转换：本软件的 JSON 标注文件 <-> Audacity 标签轨、Praat TextGrid、RTTM、CSV
+
+所有读取函数返回与 JSON 标注文件相同结构的 dict：
+    {"audio_file": ..., "sample_rate": ..., "duration/s": ..., "labels": [{"start", "end", "label"}, ...]}
+写入函数接受同样的 dict。
+
+整个目录树批量转换（多进程，结果边完成边输出）：
+    python label_convert.py <src_dir> <dst_dir> --from json --to textgrid [-j 8]
+    python label_convert.py <src_dir> <dst_dir> --from audacity --to json
+    python label_convert.py <src_dir> all.rttm --from json --to rttm    # 合并输出到一个文件
+    python label_convert.py all.rttm <dst_dir> --from rttm --to json --audio <audio_dir>   # 按文件拆回
+"""
+import os
+import re
+import io
+import csv
+import sys
+import glob
+import argparse
+from multiprocessing import Pool
+
+from labelio import accepted_labels, find_wav_files, make_label_data, read_label_file, write_label_file
+
+
+def label_duration(data):
+    """标注文件中的时长：两种保存路径分别写 "duration/s" 或 "duration"，都没有时取最后一个标注的结束时间"""
+    duration = data.get("duration/s", data.get("duration"))
+    if duration is None:
+        duration = max((label["end"] for label in data.get("labels", [])), default=0.0)
+    return duration
+
+
+def _label_data(audio_path, labels, duration=None):
+    """读取第三方格式后组装标注数据，有对应音频时从文件头取采样率和时长"""
+    sample_rate = None
+    if audio_path and os.path.exists(audio_path):
+        import soundfile as sf
+        info = sf.info(audio_path)
+        sample_rate, duration = info.samplerate, info.frames / info.samplerate
+    if duration is None:
+        duration = max((label["end"] for label in labels), default=0.0)
+    return make_label_data(audio_path, sample_rate, duration, labels)
+
+
+# ---- JSON ----
+
+def read_json(path, audio_path=None):
+    # 尚未接受的预标注不是标注，不导出
+    data = read_label_file(path)
+    data["labels"] = accepted_labels(data.get("labels", []))
+    return data
+
+
+def write_json(data, path):
+    write_label_file(path, data)
+
+
+# ---- Audacity 标签轨（制表符分隔的 start end label，"\\" 开头的行是频率范围，忽略） ----
+
+def read_audacity(path, audio_path=None):
+    labels = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('\\'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            labels.append({"start": float(fields[0]), "end": float(fields[1]),
+                           "label": fields[2] if len(fields) > 2 else ""})
+    return _label_data(audio_path, labels)
+
+
+def format_audacity(data):
+    return ''.join(f"{label['start']:.6f}\t{label['end']:.6f}\t{label['label']}\n" for label in data["labels"])
+
+
+# ---- Praat TextGrid ----
+
+def _textgrid_tokens(text):
+    """
+    取出 TextGrid 中的值（数字和带引号的字符串），同时兼容长格式（key = value）和短格式
+    :return: 值列表，字符串保留为 str，数字为 float
+    """
+    tokens = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.endswith(':') or line == '<exists>':  # item [1]: / intervals [1]:
+            continue
+        if '=' in line and not line.startswith('"'):
+            line = line.split('=', 1)[1].strip()
+        for m in re.finditer(r'"((?:[^"]|"")*)"|(-?[0-9.]+(?:[eE][-+]?[0-9]+)?)', line):
+            tokens.append(m.group(1).replace('""', '"') if m.group(1) is not None else float(m.group(2)))
+    return tokens
+
+
+def read_textgrid(path, audio_path=None):
+    """读取所有 IntervalTier 中文字非空的区间（TextTier 的点标注记为 start == end）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tokens = _textgrid_tokens(f.read())
+    # "ooTextFile", "TextGrid", xmin, xmax, 层数
+    pos = 2
+    xmax = tokens[pos + 1]
+    n_tiers = int(tokens[pos + 2])
+    pos += 3
+    labels = []
+    for _ in range(n_tiers):
+        tier_class, _name = tokens[pos], tokens[pos + 1]
+        n_items = int(tokens[pos + 4])
+        pos += 5
+        for _ in range(n_items):
+            if tier_class == "IntervalTier":
+                start, end, text = tokens[pos:pos + 3]
+                pos += 3
+            else:
+                start, text = tokens[pos:pos + 2]
+                end = start
+                pos += 2
+            if str(text).strip():
+                labels.append({"start": start, "end": end, "label": str(text)})
+    labels.sort(key=lambda label: (label["start"], label["end"]))
+    return _label_data(audio_path, labels, xmax)
+
+
+def format_textgrid(data):
+    """
+    写成长格式 TextGrid。区间层中的区间不能重叠，重叠的标注依次放到新的层（labels, labels_2, ...），
+    每层中标注之间的空隙用空区间补齐
+    """
+    duration = label_duration(data)
+    tiers = []  # 每层 [(start, end, text)]
+    for label in sorted(data["labels"], key=lambda label: (label["start"], label["end"])):
+        for tier in tiers:
+            if tier[-1][1] <= label["start"]:
+                tier.append((label["start"], label["end"], label["label"]))
+                break
+        else:
+            tiers.append([(label["start"], label["end"], label["label"])])
+
+    def quote(text):
+        return '"' + str(text).replace('"', '""') + '"'
+
+    out = io.StringIO()
+    out.write('File type = "ooTextFile"\nObject class = "TextGrid"\n\n')
+    out.write(f'xmin = 0\nxmax = {duration}\ntiers? <exists>\nsize = {len(tiers)}\nitem []:\n')
+    for i, tier in enumerate(tiers):
+        intervals, t = [], 0.0
+        for start, end, text in tier:
+            if start > t:
+                intervals.append((t, start, ""))
+            intervals.append((start, end, text))
+            t = end
+        if t < duration:
+            intervals.append((t, duration, ""))
+        name = "labels" if i == 0 else f"labels_{i + 1}"
+        out.write(f'    item [{i + 1}]:\n        class = "IntervalTier"\n        name = {quote(name)}\n')
+        out.write(f'        xmin = 0\n        xmax = {duration}\n        intervals: size = {len(intervals)}\n')
+        for j, (start, end, text) in enumerate(intervals):
+            out.write(f'        intervals [{j + 1}]:\n            xmin = {start}\n            xmax = {end}\n'
+                      f'            text = {quote(text)}\n')
+    return out.getvalue()
+
+
+# ---- RTTM（SPEAKER <file-id> <channel> <start> <duration> <NA> <NA> <label> <NA> <NA>） ----
+
+def rttm_file_id(data):
+    return os.path.splitext(os.path.basename(data.get("audio_file") or "unknown"))[0]
+
+
+def _rttm_rows(f):
+    """逐行取出 (file-id, 标注)"""
+    for line in f:
+        fields = line.split()
+        if len(fields) < 8 or fields[0].startswith(';'):
+            continue
+        start, duration = float(fields[3]), float(fields[4])
+        yield fields[1], {"start": start, "end": start + duration, "label": fields[7]}
+
+
+def read_rttm(path, audio_path=None, file_id=None):
+    """:param file_id: 只取该 file-id 的行（RTTM 常把多个文件合并在一起），None 表示全部"""
+    with open(path, 'r', encoding='utf-8') as f:
+        labels = [label for fid, label in _rttm_rows(f) if file_id is None or fid == file_id]
+    return _label_data(audio_path, labels)
+
+
+def format_rttm(data):
+    file_id = rttm_file_id(data)
+    # RTTM 以空白分隔，标签中的空白替换为下划线
+    return ''.join(f"SPEAKER {file_id} 1 {label['start']:.6f} {label['end'] - label['start']:.6f} "
+                   f"<NA> <NA> {'_'.join(str(label['label']).split()) or '<NA>'} <NA> <NA>\n"
+                   for label in data["labels"])
+
+
+# ---- CSV（start,end,label；合并输出时在最前面加一列 audio_file） ----
+
+CSV_FIELDS = ["start", "end", "label"]
+
+
+def _csv_rows(f):
+    """逐行取出 (audio_file 列，没有该列时为空字符串, 标注)"""
+    for row in csv.DictReader(f):
+        yield row.get("audio_file") or "", {"start": float(row["start"]), "end": float(row["end"]),
+                                            "label": row["label"]}
+
+
+def read_csv(path, audio_path=None):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        labels = [label for _, label in _csv_rows(f)]
+    return _label_data(audio_path, labels)
+
+
+def format_csv(data, with_header=True, with_file=False):
+    out = io.StringIO()
+    fields = (["audio_file"] if with_file else []) + CSV_FIELDS
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore', lineterminator='\n')
+    if with_header:
+        writer.writeheader()
+    for label in data["labels"]:
+        writer.writerow(dict(label, audio_file=data.get("audio_file")))
+    return out.getvalue()
+
+
+def _text_writer(format_func):
+    def write(data, path):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(format_func(data))
+    return write
+
+
+# 格式名 -> (读取函数, 写入函数, 文件扩展名)
+FORMATS = {
+    "json": (read_json, write_json, ".json"),
+    "audacity": (read_audacity, _text_writer(format_audacity), ".txt"),
+    "textgrid": (read_textgrid, _text_writer(format_textgrid), ".TextGrid"),
+    "rttm": (read_rttm, _text_writer(format_rttm), ".rttm"),
+    "csv": (read_csv, _text_writer(format_csv), ".csv"),
+}
+
+
+def format_for_path(path):
+    """按扩展名推断格式"""
+    ext = os.path.splitext(path)[1].lower()
+    for name, (_, _, fmt_ext) in FORMATS.items():
+        if ext == fmt_ext.lower():
+            return name
+    raise ValueError(f"unknown label format: {path}")
+
+
+def read_labels(path, fmt=None, audio_path=None):
+    """读取任意支持格式的标注文件"""
+    return FORMATS[fmt or format_for_path(path)][0](path, audio_path=audio_path)
+
+
+def write_labels(data, path, fmt=None):
+    FORMATS[fmt or format_for_path(path)][1](data, path)
+
+
+# ---- 目录树批量转换 ----
+
+def find_label_files(folder_path, fmt):
+    ext = FORMATS[fmt][2]
+    paths = glob.glob(os.path.join(folder_path, '**', '*' + ext), recursive=True)
+    if fmt == "json":
+        # 跳过冲突备份等非标注文件
+        paths = [p for p in paths if '.conflict-' not in os.path.basename(p)]
+    return sorted(paths)
+
+
+def _audio_for(label_path):
+    """与标注文件同名的音频（只认 .wav），不存在时返回 None"""
+    audio_path = os.path.splitext(label_path)[0] + '.wav'
+    return audio_path if os.path.exists(audio_path) else None
+
+
+def _convert_one(task):
+    """工作进程：转换一个文件。返回 (src, 输出内容或 None, 错误信息)"""
+    src, dst, src_fmt, dst_fmt, combined = task
+    try:
+        data = read_labels(src, src_fmt, audio_path=_audio_for(src))
+        if combined:
+            text = format_csv(data, with_header=False, with_file=True) if dst_fmt == "csv" else format_rttm(data)
+            return src, text, None
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        write_labels(data, dst, dst_fmt)
+        return src, None, None
+    except Exception as e:
+        return src, None, f"{type(e).__name__}: {str(e)}"
+
+
+def read_combined(path, fmt):
+    """
+    读取合并输出的 .rttm / .csv，按文件分组
+    :return: {键: [标注]}，按首次出现的顺序；RTTM 的键为 file-id，CSV 的键为 audio_file 列
+    """
+    rows = _rttm_rows if fmt == "rttm" else _csv_rows
+    groups = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for key, label in rows(f):
+            groups.setdefault(key, []).append(label)
+    return groups
+
+
+def split_combined(src, dst, src_fmt, dst_fmt, audio_dir=None, log=print):
+    """
+    把合并的 .rttm / .csv 拆回每个音频一个 dst_fmt 标注文件，写到 dst 目录
+    :param audio_dir: 音频所在目录。按 file-id（音频文件名去掉扩展名）或 audio_file 列找到音频时，
+                      输出保持音频在 audio_dir 中的相对路径，采样率和时长取自音频（dst 与 audio_dir 相同时即写在音频旁边）；
+                      找不到时输出到 dst/<file-id>
+    :return: (成功数, 失败列表[(键, 错误)])
+    """
+    by_id = {}
+    for path in sorted(find_wav_files(audio_dir)) if audio_dir else []:
+        by_id.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+
+    n_ok, failures, written = 0, [], set()
+    for key, labels in read_combined(src, src_fmt).items():
+        file_id = os.path.splitext(os.path.basename(key))[0] or "unknown"
+        try:
+            audio_path = key if key and os.path.isfile(key) else None
+            if audio_path is None and by_id.get(file_id):
+                if len(by_id[file_id]) > 1:
+                    raise ValueError(f"file-id {file_id} matches {len(by_id[file_id])} audio files")
+                audio_path = by_id[file_id][0]
+            rel = file_id
+            if audio_path and audio_dir:
+                audio_rel = os.path.relpath(audio_path, audio_dir)
+                if not audio_rel.startswith(os.pardir):
+                    rel = os.path.splitext(audio_rel)[0]
+            path = os.path.join(dst, rel + FORMATS[dst_fmt][2])
+            if path in written:
+                raise ValueError(f"more than one group writes {path}")
+            written.add(path)
+            data = _label_data(audio_path, labels)
+            # 音频写绝对路径（相对路径会按标注文件所在目录解析）；找不到音频时保留原来的文件名 / file-id，再次合并输出时不变
+            data["audio_file"] = os.path.abspath(audio_path) if audio_path else key or file_id
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            write_labels(data, path, dst_fmt)
+            n_ok += 1
+        except Exception as e:
+            failures.append((key, f"{type(e).__name__}: {str(e)}"))
+            log(f"[label_convert] failed {key}: {failures[-1][1]}")
+    return n_ok, failures
+
+
+def convert_tree(src_dir, dst, src_fmt, dst_fmt, jobs=None, chunksize=64, log=print, audio_dir=None):
+    """
+    把 src_dir 下所有 src_fmt 标注文件转换为 dst_fmt
+    :param src_dir: 源目录；src_fmt 为 rttm/csv 且 src_dir 是一个文件时，把这个合并文件按文件拆开（见 split_combined）
+    :param dst: 输出目录（保持相对路径）；dst_fmt 为 rttm/csv 且 dst 以相应扩展名结尾时合并输出到这一个文件
+    :return: (成功数, 失败列表[(路径, 错误)])
+    """
+    if src_fmt in ("rttm", "csv") and os.path.isfile(src_dir):
+        return split_combined(src_dir, dst, src_fmt, dst_fmt, audio_dir=audio_dir, log=log)
+    combined = dst_fmt in ("rttm", "csv") and dst.lower().endswith(FORMATS[dst_fmt][2].lower())
+    tasks = []
+    for src in find_label_files(src_dir, src_fmt):
+        rel = os.path.splitext(os.path.relpath(src, src_dir))[0]
+        tasks.append((src, os.path.join(dst, rel + FORMATS[dst_fmt][2]), src_fmt, dst_fmt, combined))
+
+    n_ok, failures = 0, []
+    out = None
+    if combined:
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        out = open(dst, 'w', encoding='utf-8', newline='')
+        if dst_fmt == "csv":
+            out.write(','.join(["audio_file"] + CSV_FIELDS) + '\n')
+    try:
+        with Pool(jobs) as pool:
+            # 每个结果一完成就写出 / 打印，不在内存中累积
+            for src, text, error in pool.imap_unordered(_convert_one, tasks, chunksize=chunksize):
+                if error is not None:
+                    failures.append((src, error))
+                    log(f"[label_convert] failed {src}: {error}")
+                    continue
+                if out is not None:
+                    out.write(text)
+                n_ok += 1
+    finally:
+        if out is not None:
+            out.close()
+    return n_ok, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量转换标注格式")
+    parser.add_argument("src", help="源目录，或要按文件拆开的合并 .rttm / .csv 文件")
+    parser.add_argument("dst", help="输出目录，或合并输出的 .rttm / .csv 文件")
+    parser.add_argument("--from", dest="src_fmt", choices=sorted(FORMATS), default="json")
+    parser.add_argument("--to", dest="dst_fmt", choices=sorted(FORMATS), required=True)
+    parser.add_argument("--audio", default=None, help="拆开合并文件时按 file-id 查找音频的目录")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为 CPU 核数")
+    args = parser.parse_args()
+
+    n_ok, failures = convert_tree(args.src, args.dst, args.src_fmt, args.dst_fmt, args.jobs, audio_dir=args.audio)
+    print(f"[label_convert] converted {n_ok}, failed {len(failures)}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,356 @@
+"""
+多人标注服务（本地 HTTP/JSON API）
+
+把一个文件夹通过 HTTP 提供给多个标注客户端，波形峰值、频谱图只在服务端计算一次并缓存：
+
+    GET    /files                                  文件列表及是否已标注
+    GET    /next                                   下一个未标注且未被其他人领取的文件
+    GET    /peaks?file=<rel>                       多分辨率波形峰值
+    GET    /samples?file=<rel>&start=<n>&stop=<n>  原始采样（单声道 float32）
+    GET    /spectrogram?file=<rel>[&start=<s>&end=<s>][&bandwidth=<hz>]
+                                                   量化频谱图（可只取一段时间的切片，可限定分析带宽）
+    GET    /labels?file=<rel>                      读取标注（含 "version"，没有标注文件时为 0）
+    PUT    /labels?file=<rel>                      写入标注，请求体 {"labels": [...][, "version": n]}；
+                                                   给出读取时的 version 且文件已被他人修改时返回 409
+    DELETE /labels?file=<rel>                      删除标注
+
+数组以 {"dtype", "shape", "data": base64} 的形式编码在 JSON 中。
+
+启动：
+    python label_server.py <folder> [--host 127.0.0.1] [--port 8765]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+import numpy as np
+import soundfile as sf
+
+from labelio import (find_wav_files, has_labels, label_json_path, make_label_data, read_label_file,
+                     write_label_file, LabelConflictError)
+from peakfile import WaveformPeaks
+from spectrogram import compute_spectrogram
+
+DEFAULT_PORT = 8765
+# 领取后多久未提交标注就重新放回队列（秒）
+CLAIM_TIMEOUT = 600
+
+
+def encode_array(a):
+    a = np.ascontiguousarray(a)
+    return {"dtype": a.dtype.str, "shape": list(a.shape), "data": base64.b64encode(a.tobytes()).decode('ascii')}
+
+
+def decode_array(d):
+    return np.frombuffer(base64.b64decode(d["data"]), dtype=np.dtype(d["dtype"])).reshape(d["shape"])
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class FileCache:
+    """解码后的音频、峰值和频谱图的 LRU 缓存，每个文件只计算一次"""
+
+    def __init__(self, max_files=8):
+        self.max_files = max_files
+        self.entries = OrderedDict()
+        self.locks = {}
+        # 正在使用（持有或等待锁）各文件的请求数，使用中的项不淘汰，否则锁被换掉后同一文件会被并行重复解码
+        self.users = {}
+
+    async def get(self, path, key, compute):
+        """取 path 的 key 项，不存在时在线程池中调用 compute(entry) 计算"""
+        lock = self.locks.setdefault(path, asyncio.Lock())
+        self.users[path] = self.users.get(path, 0) + 1
+        try:
+            async with lock:
+                entry = self.entries.get(path)
+                if entry is None:
+                    entry = self.entries[path] = {}
+                self.entries.move_to_end(path)
+                self._evict()
+                if key not in entry:
+                    loop = asyncio.get_running_loop()
+                    entry[key] = await loop.run_in_executor(None, compute, entry)
+                return entry[key]
+        finally:
+            self.users[path] -= 1
+            if not self.users[path]:
+                del self.users[path]
+                if path not in self.entries:
+                    self.locks.pop(path, None)
+
+    def _evict(self):
+        """超出容量时从最久未用的开始淘汰，跳过正在使用的项"""
+        for old_path in list(self.entries):
+            if len(self.entries) <= self.max_files:
+                break
+            if self.users.get(old_path):
+                continue
+            del self.entries[old_path]
+            self.locks.pop(old_path, None)
+
+
+class LabelServer:
+    def __init__(self, folder_path, max_cached_files=8):
+        self.root = os.path.abspath(folder_path)
+        self.cache = FileCache(max_cached_files)
+        self.claims = {}  # 相对路径 -> 领取时间
+
+    # ---- 文件 ----
+
+    def list_files(self):
+        return sorted(os.path.relpath(p, self.root) for p in find_wav_files(self.root))
+
+    def resolve(self, rel):
+        """相对路径 -> 绝对路径，拒绝访问根目录以外的文件"""
+        if not rel:
+            raise HTTPError(400, "missing 'file'")
+        path = os.path.abspath(os.path.join(self.root, rel))
+        if os.path.commonpath([path, self.root]) != self.root or not os.path.isfile(path):
+            raise HTTPError(404, f"no such file: {rel}")
+        return path
+
+    def is_labeled(self, path):
+        return has_labels(label_json_path(path))
+
+    # ---- DSP（在线程池中执行） ----
+
+    @staticmethod
+    def _decode(path, entry):
+        if 'audio' not in entry:
+            data, sr = sf.read(path, dtype='float32')
+            if data.ndim > 1:
+                data = data[:, 0]
+            entry['audio'] = (data, sr)
+        return entry['audio']
+
+    async def peaks(self, path):
+        def compute(entry):
+            peaks = WaveformPeaks.load(path)
+            if peaks is None:
+                peaks = WaveformPeaks.from_audio(*self._decode(path, entry))
+                try:
+                    peaks.save(path)
+                except OSError:
+                    pass
+            return peaks
+        return await self.cache.get(path, 'peaks', compute)
+
+    async def audio(self, path):
+        return await self.cache.get(path, 'audio', lambda entry: self._decode(path, entry))
+
+    async def spectrogram(self, path, bandwidth=None):
+        def compute(entry):
+            return compute_spectrogram(*self._decode(path, entry), bandwidth=bandwidth)
+        return await self.cache.get(path, f'spectrogram:{bandwidth}', compute)
+
+    # ---- 请求处理 ----
+
+    async def handle(self, method, route, query, body):
+        rel = query.get('file')
+
+        if route == '/files' and method == 'GET':
+            return {"files": [{"file": rel, "labeled": self.is_labeled(os.path.join(self.root, rel))}
+                              for rel in self.list_files()]}
+
+        if route == '/next' and method == 'GET':
+            now = time.time()
+            for rel in self.list_files():
+                if self.is_labeled(os.path.join(self.root, rel)):
+                    continue
+                if now - self.claims.get(rel, 0) < CLAIM_TIMEOUT:
+                    continue
+                self.claims[rel] = now
+                return {"file": rel}
+            return {"file": None}
+
+        if route == '/peaks' and method == 'GET':
+            peaks = await self.peaks(self.resolve(rel))
+            return {"n_samples": peaks.n_samples, "sample_rate": peaks.sample_rate,
+                    "levels": {str(b): [encode_array(a) for a in arrays] for b, arrays in peaks.levels.items()}}
+
+        if route == '/samples' and method == 'GET':
+            data, sr = await self.audio(self.resolve(rel))
+            start = max(int(query.get('start', 0)), 0)
+            stop = min(int(query.get('stop', len(data))), len(data))
+            return {"sample_rate": sr, "start": start, "samples": encode_array(data[start:stop])}
+
+        if route == '/spectrogram' and method == 'GET':
+            bandwidth = float(query['bandwidth']) if query.get('bandwidth') else None
+            image, extent, db_range = await self.spectrogram(self.resolve(rel), bandwidth)
+            extent = list(extent)
+            if 'start' in query or 'end' in query:
+                # 按时间切片（图像第 0 维是时间帧）
+                n = len(image)
+                frame_time = (extent[1] - extent[0]) / max(n, 1)
+                f0 = int(np.clip((float(query.get('start', extent[0])) - extent[0]) / frame_time, 0, n))
+                f1 = int(np.clip(np.ceil((float(query.get('end', extent[1])) - extent[0]) / frame_time), f0, n))
+                image = image[f0:f1]
+                extent[:2] = extent[0] + f0 * frame_time, extent[0] + f1 * frame_time
+            return {"image": encode_array(image), "extent": extent, "db_range": list(db_range)}
+
+        if route == '/labels':
+            path = self.resolve(rel)
+            json_path = label_json_path(path)
+            if method == 'GET':
+                if not os.path.exists(json_path):
+                    return {"labels": [], "version": 0}
+                data = read_label_file(json_path)
+                return dict(data, version=data.get("version", 0))
+            if method == 'PUT':
+                labels = body.get("labels") if isinstance(body, dict) else None
+                if not isinstance(labels, list):
+                    raise HTTPError(400, "body must be {\"labels\": [...]}")
+                expected_version = body.get("version")
+                if expected_version is not None and not isinstance(expected_version, int):
+                    raise HTTPError(400, "version must be an integer")
+                peaks = await self.peaks(path)
+                try:
+                    version = write_label_file(json_path, make_label_data(
+                        path, peaks.sample_rate, peaks.n_samples / peaks.sample_rate, labels),
+                        expected_version=expected_version)
+                except LabelConflictError as e:
+                    raise HTTPError(409, str(e))
+                self.claims.pop(rel, None)
+                return {"ok": True, "version": version}
+            if method == 'DELETE':
+                if os.path.exists(json_path):
+                    os.remove(json_path)
+                return {"ok": True}
+
+        raise HTTPError(404, f"no route: {method} {route}")
+
+    async def on_connection(self, reader, writer):
+        status, payload = 200, None
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            raw = await reader.readexactly(length) if length else b''
+
+            url = urllib.parse.urlsplit(target)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            body = json.loads(raw) if raw else None
+            payload = await self.handle(method, url.path, query, body)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.on_connection, host, port)
+        print(f"[LabelServer] serving {self.root} on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+class LabelClient:
+    """LabelServer 的客户端，AudioLabeler 的瘦客户端模式通过它访问服务端"""
+
+    def __init__(self, url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, route, body=None, **query):
+        url = self.url + route
+        if query:
+            url += '?' + urllib.parse.urlencode(query)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read()).get("error", str(e))
+            if e.code == 409:
+                raise LabelConflictError(message) from None
+            raise RuntimeError(message) from None
+
+    def list_files(self):
+        return [item["file"] for item in self.request('GET', '/files')["files"]]
+
+    def next_file(self):
+        return self.request('GET', '/next')["file"]
+
+    def get_peaks(self, rel):
+        d = self.request('GET', '/peaks', file=rel)
+        levels = {int(b): tuple(decode_array(a) for a in arrays) for b, arrays in d["levels"].items()}
+        return WaveformPeaks(levels, d["n_samples"], d["sample_rate"])
+
+    def get_samples(self, rel, start, stop):
+        return decode_array(self.request('GET', '/samples', file=rel, start=start, stop=stop)["samples"])
+
+    def get_spectrogram(self, rel, start=None, end=None, bandwidth=None):
+        query = {"file": rel}
+        if bandwidth:
+            query["bandwidth"] = bandwidth
+        if start is not None:
+            query["start"] = start
+        if end is not None:
+            query["end"] = end
+        d = self.request('GET', '/spectrogram', **query)
+        return decode_array(d["image"]), tuple(d["extent"]), tuple(d["db_range"])
+
+    def get_labels(self, rel):
+        """标注文件内容，"version" 为当前版本号（没有标注文件时为 0）"""
+        return self.request('GET', '/labels', file=rel)
+
+    def put_labels(self, rel, labels, version=None):
+        """
+        写入标注
+        :param version: 读取时的版本号；给出时服务端先检查，已被他人修改则抛出 LabelConflictError
+        :return: 写入后的版本号
+        """
+        body = {"labels": labels}
+        if version is not None:
+            body["version"] = version
+        return self.request('PUT', '/labels', body=body, file=rel)["version"]
+
+    def delete_labels(self, rel):
+        return self.request('DELETE', '/labels', file=rel)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AnLabeler 多人标注服务")
+    parser.add_argument("folder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache", type=int, default=8, help="缓存的文件数")
+    args = parser.parse_args()
+    try:
+        asyncio.run(LabelServer(args.folder, args.cache).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        sys.exit(0)
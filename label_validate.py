@@ -0,0 +1,181 @@
+"""
+标注文件批量检查与修复
+
+对目录树中每个有标注文件（同名 .json）的音频，按音频文件头（只读文件头，不解码采样）检查：
+    invalid_json        JSON 无法解析（不能自动修复）
+    bad_labels          "labels" 缺失或不是列表（不能自动修复）
+    bad_label           标注缺少 start / end / label 或时间不是数字（不能自动修复）
+    start_after_end     起点晚于终点（修复：交换）
+    empty_region        起点等于终点（修复：删除）
+    out_of_range        超出 [0, 时长]（修复：截断，截断后为空则删除）
+    overlap             同一标签的区域相互重叠（修复：合并）
+    sample_rate         "sample_rate" 与文件头不符（修复：改为文件头的值）
+    duration            "duration/s" 或 "duration"（两种保存路径分别写其中一个）与文件头不符（修复：改正）
+    stale_audio_file    "audio_file" 不指向该音频（修复：改为当前路径）
+有不能自动修复的问题时 --fix 不写回该文件（其他问题也不修复），以免丢掉需要人工处理的标注。
+多进程检查，输出机器可读的 JSON 汇总。
+
+    python label_validate.py <folder> [--fix] [-j 8] [--report report.json]
+"""
+import os
+import sys
+import json
+import argparse
+from multiprocessing import Pool
+
+import soundfile as sf
+
+from labelio import find_wav_files, label_json_path, read_label_file, write_label_file
+
+# 时长比较的容差（秒）
+DURATION_TOLERANCE = 0.001
+DURATION_KEYS = ("duration/s", "duration")
+# 不能自动修复的问题
+UNFIXABLE = {"bad_audio", "invalid_json", "bad_labels", "bad_label"}
+
+
+def _issue(code, message, index=None):
+    issue = {"code": code, "message": message}
+    if index is not None:
+        issue["label_index"] = index
+    return issue
+
+
+def _check_labels(labels, duration):
+    """检查标注列表，返回 (问题列表, 修复后的标注列表)"""
+    issues, kept = [], []
+    for i, label in enumerate(labels):
+        try:
+            start, end = float(label["start"]), float(label["end"])
+            if "label" not in label:
+                raise KeyError("label")
+        except (KeyError, TypeError, ValueError):
+            issues.append(_issue("bad_label", f"label {i} is malformed: {label!r}", i))
+            continue
+        if start > end:
+            issues.append(_issue("start_after_end", f"label {i}: start {start} > end {end}", i))
+            start, end = end, start
+        if start < 0 or end > duration + DURATION_TOLERANCE:
+            issues.append(_issue("out_of_range", f"label {i}: {start}-{end} outside 0-{duration:.6f}", i))
+            start, end = max(start, 0.0), min(end, duration)
+        if end <= start:
+            issues.append(_issue("empty_region", f"label {i} has zero length", i))
+            continue
+        kept.append(dict(label, start=start, end=end))
+
+    # 同一标签的区域按起点排序后合并相互重叠的
+    kept.sort(key=lambda label: (str(label["label"]), label["start"]))
+    merged = []
+    for label in kept:
+        last = merged[-1] if merged else None
+        if last is not None and str(last["label"]) == str(label["label"]) and label["start"] < last["end"]:
+            issues.append(_issue("overlap", f"'{label['label']}' {last['start']}-{last['end']} overlaps "
+                                            f"{label['start']}-{label['end']}"))
+            last["end"] = max(last["end"], label["end"])
+            continue
+        merged.append(label)
+    merged.sort(key=lambda label: label["start"])
+    return issues, merged
+
+
+def check_sidecar(audio_path, fix=False):
+    """
+    检查（并可修复）一个音频的标注文件
+    :return: {"audio", "json", "issues": [{"code", "message"[, "label_index"]}], "fixed": bool}
+    """
+    json_path = label_json_path(audio_path)
+    result = {"audio": audio_path, "json": json_path, "issues": [], "fixed": False}
+    try:
+        info = sf.info(audio_path)
+    except RuntimeError as e:
+        result["issues"].append(_issue("bad_audio", f"cannot read audio header: {str(e)}"))
+        return result
+    duration = info.frames / info.samplerate
+
+    try:
+        data = read_label_file(json_path)
+        if not isinstance(data, dict):
+            raise ValueError("top level is not an object")
+    except (OSError, ValueError) as e:
+        result["issues"].append(_issue("invalid_json", str(e)))
+        return result
+
+    issues = result["issues"]
+    if data.get("sample_rate") != info.samplerate:
+        issues.append(_issue("sample_rate", f"sample_rate {data.get('sample_rate')} != {info.samplerate}"))
+        data["sample_rate"] = info.samplerate
+    keys = [key for key in DURATION_KEYS if key in data] or [DURATION_KEYS[0]]
+    for key in keys:
+        value = data.get(key)
+        if not isinstance(value, (int, float)) or abs(value - duration) > DURATION_TOLERANCE:
+            issues.append(_issue("duration", f"{key} {value} != {duration:.6f}"))
+            data[key] = duration
+    audio_file = data.get("audio_file")
+    # 相对路径按标注文件所在目录解析
+    if (not isinstance(audio_file, str)
+            or os.path.abspath(os.path.join(os.path.dirname(json_path), audio_file)) != os.path.abspath(audio_path)):
+        issues.append(_issue("stale_audio_file", f"audio_file {audio_file!r} does not point to {audio_path}"))
+        # 写绝对路径：audio_path 可能相对于当前目录，而读取时相对路径按标注文件所在目录解析
+        data["audio_file"] = os.path.abspath(audio_path)
+
+    labels = data.get("labels")
+    if not isinstance(labels, list):
+        issues.append(_issue("bad_labels", "labels is missing or not a list"))
+        labels = []
+    label_issues, data["labels"] = _check_labels(labels, duration)
+    issues.extend(label_issues)
+
+    if fix and issues and not any(issue["code"] in UNFIXABLE for issue in issues):
+        try:
+            write_label_file(json_path, data, expected_version=data.get("version", 0))
+            result["fixed"] = True
+        except Exception as e:
+            issues.append(_issue("write_failed", str(e)))
+    return result
+
+
+def _check_one(task):
+    audio_path, fix = task
+    return check_sidecar(audio_path, fix)
+
+
+def validate_tree(folder_path, fix=False, jobs=None, chunksize=16, log=print):
+    """
+    检查目录树中所有标注文件（多进程）
+    :return: 汇总 dict：files、files_with_issues、fixed、issues（各类问题计数）、results（有问题的文件）
+    """
+    tasks = [(path, fix) for path in sorted(find_wav_files(folder_path))
+             if os.path.exists(label_json_path(path))]
+    summary = {"folder": folder_path, "files": len(tasks), "files_with_issues": 0, "fixed": 0,
+               "issues": {}, "results": []}
+    with Pool(jobs) as pool:
+        for result in pool.imap_unordered(_check_one, tasks, chunksize=chunksize):
+            if not result["issues"]:
+                continue
+            summary["files_with_issues"] += 1
+            summary["fixed"] += result["fixed"]
+            for issue in result["issues"]:
+                summary["issues"][issue["code"]] = summary["issues"].get(issue["code"], 0) + 1
+            summary["results"].append(result)
+            log(f"[label_validate] {result['json']}: " + ", ".join(i["code"] for i in result["issues"]))
+    summary["results"].sort(key=lambda result: result["json"])
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量检查 / 修复标注文件")
+    parser.add_argument("folder")
+    parser.add_argument("--fix", action="store_true", help="自动修复能修复的问题并写回标注文件")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为 CPU 核数")
+    parser.add_argument("--report", help="把 JSON 汇总写入该文件（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    summary = validate_tree(args.folder, args.fix, args.jobs, log=lambda msg: print(msg, file=sys.stderr))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=4)
+    else:
+        json.dump(summary, sys.stdout, indent=4)
+        print()
+    unfixed = summary["files_with_issues"] - summary["fixed"]
+    sys.exit(1 if unfixed else 0)
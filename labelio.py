@@ -0,0 +1,88 @@
+"""
+WAV 文件查找与标注文件（与音频同名的 .json）读写
+
+格式：{"audio_file": ..., "sample_rate": ..., "duration/s": ..., "labels": [{"start", "end", "label"}, ...]}
+自动保存的文件另有 "version" 字段，每次写入加 1，用于检测多人同时修改（乐观并发控制）。
+带 "proposal": true 的是模型给出、尚未接受的预标注，不算作标注（不导出、不复制，只有预标注的文件视为未标注）。
+"""
+import os
+import glob
+import json
+
+
+class LabelConflictError(Exception):
+    """标注文件在读取之后已被其他人修改"""
+
+
+def find_wav_files(folder_path):
+    """使用glob查找所有WAV文件（包括子文件夹）"""
+    return glob.glob(os.path.join(folder_path, '**/*.wav'), recursive=True)
+
+
+def label_json_path(audio_path):
+    """标注文件路径（与音频文件同名但扩展名为.json）"""
+    return os.path.splitext(audio_path)[0] + '.json'
+
+
+def make_label_data(audio_file, sample_rate, duration, labels, duration_key="duration/s"):
+    """组装标注文件内容"""
+    return {
+        "audio_file": audio_file,
+        "sample_rate": sample_rate,
+        duration_key: duration,
+        "labels": labels
+    }
+
+
+def read_label_file(json_path):
+    """读取标注文件，返回 dict"""
+    with open(json_path, 'r') as f:
+        return json.load(f)
+
+
+def accepted_labels(labels):
+    """去掉尚未接受的预标注（"proposal": true）"""
+    return [label for label in labels if not label.get("proposal")]
+
+
+def has_labels(json_path):
+    """标注文件是否含有已接受的标注；无法读取的文件按已标注处理，以免被当作空文件分配或覆盖"""
+    try:
+        return bool(accepted_labels(read_label_file(json_path).get("labels", [])))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, AttributeError):
+        return True
+
+
+def label_file_version(json_path):
+    """标注文件当前的版本号，文件不存在时为 0"""
+    if not os.path.exists(json_path):
+        return 0
+    return read_label_file(json_path).get("version", 0)
+
+
+def write_label_file(json_path, data, expected_version=None):
+    """
+    写入标注文件（先写临时文件再替换，避免写到一半留下损坏的 JSON）
+    :param expected_version: 读取时的版本号；给出时先检查文件未被他人修改，不一致则抛出 LabelConflictError。
+                             不给出时不检查，直接覆盖
+    :return: 写入后的版本号（总是在原有版本号上加 1，不检查时也不让版本号退回 0）
+    """
+    if expected_version is not None:
+        current = label_file_version(json_path)
+        if current != expected_version:
+            raise LabelConflictError(
+                f"{json_path} was modified by someone else (version {current}, expected {expected_version})")
+    else:
+        try:
+            current = label_file_version(json_path)
+        except (OSError, ValueError, AttributeError):
+            # 原文件不是有效的标注文件，按新文件处理
+            current = 0
+    data = dict(data, version=current + 1)
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, json_path)
+    return data.get("version")
@@ -0,0 +1,148 @@
+"""
+共享文件夹（如 NFS）上的按文件租约
+
+多人同时标注同一个文件夹时，每个实例在开始标注某个文件前先创建与音频同名的 .lock 文件
+（O_CREAT|O_EXCL 原子创建），并定期刷新其修改时间作为心跳。超过 LEASE_TIMEOUT
+没有心跳的租约视为失效，可以被其他实例接管。
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import getpass
+
+# 租约失效时间与心跳间隔（秒）
+LEASE_TIMEOUT = 120
+HEARTBEAT_INTERVAL = 30
+
+
+def lease_path(audio_path):
+    """租约文件路径（与音频文件同名，扩展名为 .lock）"""
+    return os.path.splitext(audio_path)[0] + '.lock'
+
+
+def default_owner():
+    return f"{getpass.getuser()}@{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def read_lease(audio_path):
+    """读取租约信息，没有租约时返回 None；返回的 dict 额外包含 "age"（距上次心跳的秒数）"""
+    path = lease_path(audio_path)
+    age = 0.0
+    try:
+        age = time.time() - os.stat(path).st_mtime
+        with open(path, 'r') as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # 正在写入或已损坏的租约（或暂时无法访问）按无主处理，由心跳时间判断是否失效；
+        # 读不到修改时间时 age 为 0，视为未失效，不会被接管
+        info = {"owner": None}
+    info["age"] = age
+    return info
+
+
+class LeaseManager:
+    """管理本实例持有的租约"""
+
+    def __init__(self, owner=None, timeout=LEASE_TIMEOUT):
+        self.owner = owner or default_owner()
+        self.timeout = timeout
+        self.held = set()
+
+    def _create(self, audio_path):
+        fd = os.open(lease_path(audio_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"owner": self.owner, "acquired": time.time()}, f)
+        self.held.add(audio_path)
+
+    def _break_stale(self, audio_path):
+        """接管失效的租约：先改名再检查，避免删掉别人刚刚新建的租约"""
+        path = lease_path(audio_path)
+        moved = f"{path}.{uuid.uuid4().hex[:8]}.stale"
+        try:
+            os.rename(path, moved)
+        except FileNotFoundError:
+            return
+        if time.time() - os.stat(moved).st_mtime > self.timeout:
+            os.remove(moved)
+            return
+        # 改名期间别人已重新获取了租约：放回原处（目标已存在说明又有人获取了，直接丢弃）
+        try:
+            os.link(moved, path)
+        except FileExistsError:
+            pass
+        os.remove(moved)
+
+    def acquire(self, audio_path):
+        """尝试获取租约，成功返回 True；已被其他实例持有且未失效时返回 False"""
+        if audio_path in self.held:
+            return self.refresh(audio_path)
+        for _ in range(2):
+            try:
+                self._create(audio_path)
+                return True
+            except FileExistsError:
+                info = read_lease(audio_path)
+                if info is None:
+                    continue
+                if info["owner"] == self.owner:
+                    self.held.add(audio_path)
+                    return True
+                if info["age"] <= self.timeout:
+                    return False
+                self._break_stale(audio_path)
+        return False
+
+    def refresh(self, audio_path):
+        """心跳：刷新租约的修改时间；租约已被他人接管时返回 False"""
+        info = read_lease(audio_path)
+        if info is None or info["owner"] != self.owner:
+            self.held.discard(audio_path)
+            return False
+        try:
+            os.utime(lease_path(audio_path))
+        except OSError as e:
+            # 共享文件系统暂时不可用：保留租约，下一次心跳再试（在 Qt 槽函数中调用，异常会使程序退出）
+            print(f"[leases] heartbeat failed {audio_path}: {str(e)}")
+        return True
+
+    def refresh_all(self):
+        for audio_path in list(self.held):
+            self.refresh(audio_path)
+
+    def release(self, audio_path):
+        """释放租约（只删除自己持有的）"""
+        self.held.discard(audio_path)
+        info = read_lease(audio_path)
+        if info is not None and info["owner"] == self.owner:
+            try:
+                os.remove(lease_path(audio_path))
+            except FileNotFoundError:
+                pass
+
+    def release_all(self):
+        for audio_path in list(self.held):
+            self.release(audio_path)
+
+    def is_leased_by_other(self, audio_path):
+        info = read_lease(audio_path)
+        return info is not None and info["owner"] != self.owner and info["age"] <= self.timeout
+
+    def claim_next(self, files, start=0, step=1, skip=None):
+        """
+        从 files[start] 开始按 step 方向查找并获取下一个可用的文件
+        :param skip: skip(path) 为 True 的文件跳过（例如已有标注）
+        :return: 获取到租约的下标，没有可用文件时返回 None
+        """
+        n = len(files)
+        for i in range(n):
+            index = (start + i * step) % n
+            path = files[index]
+            if skip is not None and skip(path):
+                continue
+            if self.acquire(path):
+                return index
+        return None
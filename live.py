@@ -0,0 +1,243 @@
+"""
+实时 / 增长中的录音
+
+边录边标注时，录音软件不断向 WAV 文件追加数据。WavTail 按文件大小读取新追加的采样
+（录音过程中头部的数据长度字段往往是 0 或无效值，不能依赖），交给 LiveSource：
+只保留最近 RING_SECONDS 秒的采样，并且只为新到的采样计算波形包络块和频谱帧，
+分别存放在定长的环形缓冲区中。所有位置都按录音开始以来的绝对采样数计算，
+标注时间与最终文件一致。其他来源（如声卡输入流）可以直接调用 LiveSource.push。
+
+模拟一个正在录音的文件（测试用）：
+    python live.py <out.wav> [--seconds 60] [--rate 16000]
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+
+import numpy as np
+
+from spectrogram import spectrogram_image
+
+# 环形缓冲区保存的时长（秒）
+RING_SECONDS = 60
+# 环形缓冲区内波形包络的块数（决定包络的时间分辨率）
+ENVELOPE_POINTS = 8192
+TOP_DB = 80.0
+
+
+class RingBuffer:
+    """定长环形缓冲区，按绝对行号（从 offset 开始累计）读取最近 capacity 行"""
+
+    def __init__(self, capacity, row_shape=(), dtype=np.float32, offset=0):
+        self.data = np.zeros((capacity,) + tuple(row_shape), dtype=dtype)
+        self.capacity = capacity
+        self.first = offset
+        self.count = offset
+
+    @property
+    def start(self):
+        """缓冲区中最早一行的绝对行号"""
+        return max(self.count - self.capacity, self.first)
+
+    def append(self, rows):
+        n = len(rows)
+        skip = max(n - self.capacity, 0)
+        rows = rows[skip:]
+        pos = (self.count + skip) % self.capacity
+        first = min(len(rows), self.capacity - pos)
+        self.data[pos:pos + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.count += n
+
+    def read(self, start, stop):
+        """绝对行号区间 [start, stop) 中仍在缓冲区内的部分（连续的副本）"""
+        start, stop = max(start, self.start), min(stop, self.count)
+        if stop <= start:
+            return self.data[:0].copy()
+        i0 = start % self.capacity
+        i1 = i0 + stop - start
+        if i1 <= self.capacity:
+            return self.data[i0:i1].copy()
+        return np.concatenate([self.data[i0:], self.data[:i1 - self.capacity]])
+
+    def view(self):
+        return self.read(self.start, self.count)
+
+
+class LiveSource:
+    """实时音频的环形缓冲区，增量维护波形包络和频谱帧"""
+
+    def __init__(self, sample_rate, capacity_seconds=RING_SECONDS, offset=0):
+        """
+        :param offset: 第一个送入的采样在录音中的绝对位置
+        """
+        self.sample_rate = sample_rate
+        capacity = int(capacity_seconds * sample_rate)
+        self.samples = RingBuffer(capacity, offset=offset)
+
+        # 与 compute_spectrogram 相同的 STFT 参数；帧 k 覆盖采样 [k*hop, k*hop + n_fft)
+        self.n_fft = max(int(sample_rate // 1000), 8)
+        self.hop_length = self.n_fft // 2
+        # 增量计算时没有全局最大值可作参考，以满幅正弦（汉宁窗）的幅度为 0 dB
+        self.ref_db = 20 * np.log10(self.n_fft / 4)
+        self.frames = RingBuffer(capacity // self.hop_length, (1 + self.n_fft // 2,), np.uint8,
+                                 offset=-(-offset // self.hop_length))
+
+        self.block = max(capacity // ENVELOPE_POINTS, 1)
+        self.envelope_blocks = RingBuffer(capacity // self.block, (2,), np.float32,
+                                          offset=-(-offset // self.block))
+
+    @property
+    def total(self):
+        """已收到的采样总数（绝对位置）"""
+        return self.samples.count
+
+    def push(self, x):
+        """送入新采样；一次送入很多时分段处理，保证计算包络和频谱时所需的采样仍在缓冲区中"""
+        step = self.samples.capacity // 2
+        for i in range(0, len(x), step):
+            self.samples.append(x[i:i + step])
+            self._update_envelope()
+            self._update_frames()
+
+    def _update_envelope(self):
+        b0, b1 = self.envelope_blocks.count, self.samples.count // self.block
+        if b1 <= b0:
+            return
+        x = self.samples.read(b0 * self.block, b1 * self.block).reshape(-1, self.block)
+        self.envelope_blocks.append(np.stack([x.min(axis=1), x.max(axis=1)], axis=1))
+
+    def _update_frames(self):
+        import librosa
+        k0 = self.frames.count
+        k1 = (self.samples.count - self.n_fft) // self.hop_length + 1
+        if k1 <= k0:
+            return
+        x = self.samples.read(k0 * self.hop_length, (k1 - 1) * self.hop_length + self.n_fft)
+        S = librosa.stft(x, n_fft=self.n_fft, hop_length=self.hop_length, center=False)
+        image, _ = spectrogram_image(S, top_db=TOP_DB, ref_db=self.ref_db)
+        self.frames.append(image)
+
+    def read(self, start, stop):
+        """采样区间 [start, stop) 中仍在缓冲区内的部分"""
+        return self.samples.read(start, stop)
+
+    def envelope(self):
+        """缓冲区内的 min/max 包络（交错排列），时间为录音中的绝对时间（秒）"""
+        rows = self.envelope_blocks.view()
+        b0 = self.envelope_blocks.start
+        t = (np.arange(b0, b0 + len(rows)) * self.block + self.block / 2) / self.sample_rate
+        return np.repeat(t, 2), rows.ravel()
+
+    def spectrogram(self):
+        """缓冲区内的频谱图像，返回值同 compute_spectrogram（image, extent, db_range）"""
+        image = self.frames.view()
+        x0 = (self.frames.start * self.hop_length + self.n_fft / 2) / self.sample_rate
+        extent = (x0, x0 + len(image) * self.hop_length / self.sample_rate, 0, self.sample_rate / 2)
+        return image, extent, (-TOP_DB, 0.0)
+
+
+def _decode_pcm(raw, format_tag, bits, channels):
+    """把 PCM / 浮点字节流解码为第一声道的 float32"""
+    if format_tag == 3:
+        x = np.frombuffer(raw, dtype='<f4' if bits == 32 else '<f8').astype(np.float32)
+    elif bits == 8:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif bits == 16:
+        x = np.frombuffer(raw, dtype='<i2').astype(np.float32) / (1 << 15)
+    elif bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        x = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8).astype(np.float32) / (1 << 23)
+    else:
+        x = np.frombuffer(raw, dtype='<i4').astype(np.float32) / (1 << 31)
+    return x.reshape(-1, channels)[:, 0]
+
+
+class WavTail:
+    """跟踪一个仍在写入的 WAV 文件，把新追加的采样送入 LiveSource"""
+
+    def __init__(self, path, capacity_seconds=RING_SECONDS):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(12)
+            if header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+                raise ValueError(f"{path} is not a WAV file")
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    raise ValueError(f"{path}: no data chunk yet")
+                chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                if chunk_id == b'data':
+                    self.data_offset = f.tell()
+                    break
+                body = f.read(size + (size & 1))
+                if chunk_id == b'fmt ':
+                    fmt = body
+        if fmt is None:
+            raise ValueError(f"{path}: no fmt chunk")
+        format_tag, self.channels, self.sample_rate = struct.unpack('<HHI', fmt[:8])
+        self.block_align, self.bits = struct.unpack('<HH', fmt[12:16])
+        if format_tag == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE：真正的格式在子格式 GUID 的前两个字节
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        if format_tag not in (1, 3):
+            raise ValueError(f"{path}: unsupported WAV format {format_tag}")
+        self.format_tag = format_tag
+
+        # 打开时文件已经很长的话，只从最后 capacity_seconds 秒开始读
+        self.position = max(self._available() - int(capacity_seconds * self.sample_rate), 0)
+        self.source = LiveSource(self.sample_rate, capacity_seconds, offset=self.position)
+
+    def _available(self):
+        """文件中已完整写入的帧数"""
+        return max(os.path.getsize(self.path) - self.data_offset, 0) // self.block_align
+
+    def poll(self):
+        """读取新追加的采样并送入 source，返回新采样数"""
+        n = self._available() - self.position
+        if n <= 0:
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset + self.position * self.block_align)
+            raw = f.read(n * self.block_align)
+        n = len(raw) // self.block_align
+        x = _decode_pcm(raw[:n * self.block_align], self.format_tag, self.bits, self.channels)
+        self.position += n
+        self.source.push(x)
+        return n
+
+
+def simulate_recording(path, seconds=60, sample_rate=16000, chunk=0.1):
+    """按实时速度写一个不断增长的 16 位 WAV（头部数据长度写 0，结束时才补上），用于测试"""
+    n_total = int(seconds * sample_rate)
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 0) + b'WAVE')
+        f.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16))
+        f.write(b'data' + struct.pack('<I', 0))
+        rng = np.random.default_rng()
+        written = 0
+        while written < n_total:
+            n = min(int(chunk * sample_rate), n_total - written)
+            t = (written + np.arange(n)) / sample_rate
+            # 噪声底上每两秒一个 0.3 秒的 1kHz 脉冲
+            x = 0.01 * rng.standard_normal(n) + 0.5 * np.sin(2 * np.pi * 1000 * t) * ((t % 2) < 0.3)
+            f.write((np.clip(x, -1, 1) * 32767).astype('<i2').tobytes())
+            f.flush()
+            written += n
+            time.sleep(chunk)
+        f.seek(4)
+        f.write(struct.pack('<I', 36 + 2 * written))
+        f.seek(40)
+        f.write(struct.pack('<I', 2 * written))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模拟一个正在录音、不断增长的 WAV 文件")
+    parser.add_argument("path")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--rate", type=int, default=16000)
+    args = parser.parse_args()
+    simulate_recording(args.path, args.seconds, args.rate)
+    sys.exit(0)
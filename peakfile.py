@@ -0,0 +1,183 @@
+"""
+波形峰值文件（与音频同名的 .peaks.npz）
+
+多分辨率的 min/max/RMS 摘要，类似 Audacity 的 block file。首次解码音频时写入，
+再次打开时直接用它绘制概览波形，不需要解码全部采样。
+
+批量生成：
+    python peakfile.py <folder>
+"""
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+
+from labelio import find_wav_files
+
+PEAK_VERSION = 1
+# 各层级每个块包含的采样数，后一级必须是前一级的整数倍
+BLOCK_SIZES = (64, 1024, 16384, 262144)
+
+
+def peak_file_path(audio_path):
+    """峰值文件路径（与音频文件同名，扩展名为 .peaks.npz）"""
+    return os.path.splitext(audio_path)[0] + '.peaks.npz'
+
+
+def _block_stats(x, block):
+    """按块统计 min / max / 平方和 / 采样数，最后一个不完整的块单独计算"""
+    n = len(x) // block * block
+    full = x[:n].reshape(-1, block)
+    mins, maxs = full.min(axis=1), full.max(axis=1)
+    sq = np.einsum('ij,ij->i', full, full)
+    cnt = np.full(len(full), block, dtype=np.int64)
+    if n < len(x):
+        tail = x[n:]
+        mins = np.append(mins, tail.min())
+        maxs = np.append(maxs, tail.max())
+        sq = np.append(sq, np.dot(tail, tail))
+        cnt = np.append(cnt, len(tail))
+    return mins, maxs, sq, cnt
+
+
+def _merge_stats(stats, factor):
+    """把细一级的统计每 factor 个块归并为一个块"""
+    mins, maxs, sq, cnt = stats
+    idx = np.arange(0, len(mins), factor)
+    return (np.minimum.reduceat(mins, idx), np.maximum.reduceat(maxs, idx),
+            np.add.reduceat(sq, idx), np.add.reduceat(cnt, idx))
+
+
+class WaveformPeaks:
+    """多分辨率波形摘要：levels[block] = (min, max, rms)"""
+
+    def __init__(self, levels, n_samples, sample_rate):
+        self.levels = levels
+        self.n_samples = int(n_samples)
+        self.sample_rate = int(sample_rate)
+
+    @classmethod
+    def _from_finest(cls, finest, n_samples, sample_rate, block_sizes):
+        levels = {}
+        stats = finest
+        for i, block in enumerate(block_sizes):
+            if i > 0:
+                stats = _merge_stats(stats, block // block_sizes[i - 1])
+            mins, maxs, sq, cnt = stats
+            rms = np.sqrt(sq / np.maximum(cnt, 1))
+            levels[block] = tuple(a.astype(np.float16) for a in (mins, maxs, rms))
+        return cls(levels, n_samples, sample_rate)
+
+    @classmethod
+    def from_audio(cls, data, sample_rate, block_sizes=BLOCK_SIZES):
+        """从已解码的单声道数据计算"""
+        data = np.asarray(data)
+        finest = _block_stats(data, block_sizes[0])
+        return cls._from_finest(finest, len(data), sample_rate, block_sizes)
+
+    @classmethod
+    def from_file(cls, audio_path, block_sizes=BLOCK_SIZES, chunk_blocks=16384):
+        """流式解码音频文件计算（只取第一声道），内存占用与文件长度无关"""
+        parts = []
+        n_samples = 0
+        with sf.SoundFile(audio_path) as f:
+            sample_rate = f.samplerate
+            # 每次读取的长度是最细块的整数倍，保证块边界对齐
+            for chunk in f.blocks(blocksize=block_sizes[0] * chunk_blocks, always_2d=True):
+                x = chunk[:, 0]
+                parts.append(_block_stats(x, block_sizes[0]))
+                n_samples += len(x)
+        if parts:
+            finest = tuple(np.concatenate(a) for a in zip(*parts))
+        else:
+            finest = (np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+        return cls._from_finest(finest, n_samples, sample_rate, block_sizes)
+
+    @classmethod
+    def load(cls, audio_path):
+        """读取音频对应的峰值文件，不存在、版本不符或音频已修改时返回 None"""
+        path = peak_file_path(audio_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            st = os.stat(audio_path)
+            with np.load(path) as npz:
+                if (int(npz['version']) != PEAK_VERSION or int(npz['src_size']) != st.st_size
+                        or int(npz['src_mtime_ns']) != st.st_mtime_ns):
+                    return None
+                levels = {int(b): (npz[f'min_{b}'], npz[f'max_{b}'], npz[f'rms_{b}'])
+                          for b in npz['blocks']}
+                return cls(levels, npz['n_samples'], npz['sample_rate'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, audio_path):
+        """写入峰值文件（先写临时文件再替换，避免留下半个文件）"""
+        path = peak_file_path(audio_path)
+        st = os.stat(audio_path)
+        arrays = {
+            'version': PEAK_VERSION,
+            'n_samples': self.n_samples,
+            'sample_rate': self.sample_rate,
+            'src_size': st.st_size,
+            'src_mtime_ns': st.st_mtime_ns,
+            'blocks': np.array(sorted(self.levels)),
+        }
+        for block, (mins, maxs, rms) in self.levels.items():
+            arrays[f'min_{block}'] = mins
+            arrays[f'max_{block}'] = maxs
+            arrays[f'rms_{block}'] = rms
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    def choose_level(self, start, end, max_points):
+        """
+        为采样区间 [start, end) 选择显示层级
+        :return: 块大小；区间内采样数不超过 max_points 时返回 None，表示应直接显示原始采样
+        """
+        if end - start <= max_points:
+            return None
+        for block in sorted(self.levels):
+            if (end - start) / block <= max_points:
+                return block
+        return max(self.levels)
+
+    def envelope(self, block, start, end):
+        """
+        取某层级在采样区间内的包络，min/max 交错排列以便画成一条折线
+        :return: (time_axis, minmax, rms)，rms 同样按 +rms/-rms 交错
+        """
+        mins, maxs, rms = self.levels[block]
+        i0 = max(start // block, 0)
+        i1 = min(-(-end // block), len(mins))
+        t = (np.arange(i0, i1) * block + block / 2) / self.sample_rate
+        minmax = np.empty(2 * (i1 - i0), dtype=np.float32)
+        minmax[0::2] = mins[i0:i1]
+        minmax[1::2] = maxs[i0:i1]
+        r = np.empty_like(minmax)
+        r[0::2] = -rms[i0:i1]
+        r[1::2] = rms[i0:i1]
+        return np.repeat(t, 2), minmax, r
+
+
+def build_peak_files(folder_path, force=False):
+    """为文件夹中（包括子文件夹）所有 WAV 文件生成峰值文件"""
+    for path in sorted(find_wav_files(folder_path)):
+        if not force and WaveformPeaks.load(path) is not None:
+            continue
+        try:
+            WaveformPeaks.from_file(path).save(path)
+            print("[peakfile] ", path)
+        except Exception as e:
+            print(f"[peakfile] failed {path}: {str(e)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python peakfile.py <folder> [--force]")
+        sys.exit(1)
+    build_peak_files(sys.argv[1], force='--force' in sys.argv[2:])
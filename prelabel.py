@@ -0,0 +1,288 @@
+"""
+模型预标注
+
+把外部的分类器作为插件接入：插件是一个 Python 可调用对象，一次接收一批窗口，返回每个窗口中检测到的区域
+
+    def predict(batch):
+        # batch: [(waveform, sample_rate)]，waveform 为一维 float32
+        # 返回与 batch 等长的列表，每项为 [(start, end, label, score)]，时间从窗口起点算起（秒）
+        ...
+    predict.version = "2024-05"      # 模型版本，用作缓存键；也可以写模块级的 MODEL_VERSION
+    predict.window = 2.0             # 可选：窗口长度、步长（秒）和每批窗口数
+    predict.hop = 1.0
+    predict.batch_size = 32
+
+插件用 "包.模块:函数" 或 "路径/文件.py:函数" 指定（省略函数名时为 predict）。文件按窗口切分成批，
+在进程池中运行（每个工作进程只加载一次模型），提交中的批数有上限，不会一次把整个文件夹的任务排进队列。
+重叠窗口中同一标签相互重叠的区域合并，分数取最大值。结果按模型版本缓存在
+<folder>/.anlabeler/prelabel/<模型>-<版本>.json，文件未修改时不再重新计算。
+
+    python prelabel.py <folder> --model prelabel:energy_detector [-j 8]
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import importlib
+import importlib.util
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+import soundfile as sf
+
+from labelio import find_wav_files
+
+WINDOW = 2.0
+HOP = 1.0
+BATCH_SIZE = 32
+# 加载为待复核标注的最低分数
+MIN_SCORE = 0.5
+
+
+def load_plugin(spec):
+    """按 "模块:函数" 或 "文件.py:函数" 加载插件，返回 (模块, 可调用对象)"""
+    target, name = spec, 'predict'
+    # 只在最后一级路径中找 ":"，以免把 Windows 盘符当作分隔符
+    if ':' in spec.replace('\\', '/').rsplit('/', 1)[-1]:
+        target, name = spec.rsplit(':', 1)
+    if target.endswith('.py'):
+        module_name = os.path.splitext(os.path.basename(target))[0]
+        module_spec = importlib.util.spec_from_file_location(module_name, target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return module, getattr(module, name)
+
+
+def load_model(spec):
+    return load_plugin(spec)[1]
+
+
+def model_info(spec):
+    """
+    插件的缓存键和参数
+    :return: (缓存键, 窗口, 步长, 每批窗口数)。缓存键为模型名加版本，插件没有声明版本时用模块源文件的哈希
+    """
+    # 从文件加载的插件模块不在 sys.modules 中，版本和源文件都直接从加载得到的模块取
+    module, model = load_plugin(spec)
+    version = getattr(model, 'version', None)
+    if version is None:
+        version = getattr(module, 'MODEL_VERSION', None)
+    if version is None:
+        with open(module.__file__, 'rb') as f:
+            version = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+    name = getattr(model, '__name__', type(model).__name__)
+    key = re.sub(r'[^\w.-]', '_', f"{module.__name__}.{name}-{version}")
+    return (key, float(getattr(model, 'window', WINDOW)), float(getattr(model, 'hop', HOP)),
+            int(getattr(model, 'batch_size', BATCH_SIZE)))
+
+
+def window_starts(n_frames, window, hop):
+    """窗口起点（采样），最后一个窗口与文件末尾对齐，保证覆盖整个文件"""
+    if n_frames <= window:
+        return [0]
+    starts = list(range(0, n_frames - window + 1, hop))
+    if starts[-1] + window < n_frames:
+        starts.append(n_frames - window)
+    return starts
+
+
+def merge_regions(regions, duration):
+    """合并同一标签相互重叠的区域（分数取最大），并截断到 [0, duration]"""
+    merged = []
+    for start, end, label, score in sorted(regions, key=lambda r: (r[2], r[0])):
+        start, end = max(start, 0.0), min(end, duration)
+        if end <= start:
+            continue
+        last = merged[-1] if merged else None
+        if last is not None and last[2] == label and start <= last[1]:
+            last[1] = max(last[1], end)
+            last[3] = max(last[3], score)
+            continue
+        merged.append([start, end, label, score])
+    merged.sort(key=lambda r: r[0])
+    return [(round(start, 6), round(end, 6), label, score) for start, end, label, score in merged]
+
+
+_model = None
+_model_error = None
+
+
+def _init_worker(spec):
+    # 初始化函数抛出异常时进程池会不断重启工作进程，这里只记下错误，在处理任务时报告
+    global _model, _model_error
+    try:
+        _model = load_model(spec)
+    except Exception as e:
+        _model_error = f"cannot load {spec}: {str(e)}"
+
+
+def _predict_batch(task):
+    """工作进程：读取一批窗口并调用模型，返回 (路径, [(start, end, label, score)])，时间为文件内时间"""
+    path, starts, window = task
+    if _model is None:
+        raise RuntimeError(_model_error)
+    batch = []
+    try:
+        with sf.SoundFile(path) as f:
+            sr = f.samplerate
+            for start in starts:
+                f.seek(start)
+                batch.append((f.read(window, dtype='float32', always_2d=True)[:, 0], sr))
+    except RuntimeError as e:
+        print(f"[prelabel] failed {path}: {str(e)}")
+        return path, None
+    regions = []
+    for start, predictions in zip(starts, _model(batch)):
+        for r_start, r_end, label, score in predictions:
+            regions.append((start / sr + float(r_start), start / sr + float(r_end), str(label), float(score)))
+    return path, regions
+
+
+class PrelabelCache:
+    """一个模型版本在一个文件夹中的预测结果：相对路径 -> {"size", "mtime_ns", "regions"}"""
+
+    def __init__(self, folder_path, key):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, '.anlabeler', 'prelabel', key + '.json')
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, audio_path):
+        """未修改过的文件的预测结果，没有时返回 None"""
+        entry = self.entries.get(os.path.relpath(audio_path, self.folder_path))
+        try:
+            st = os.stat(audio_path)
+        except OSError:
+            return None
+        if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+            return None
+        return [tuple(region) for region in entry["regions"]]
+
+    def put(self, audio_path, regions):
+        st = os.stat(audio_path)
+        self.entries[os.path.relpath(audio_path, self.folder_path)] = {
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns, "regions": [list(region) for region in regions]}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def run_model(spec, paths, folder_path, jobs=None, max_pending=None, log=print, cache=None):
+    """
+    对一组文件运行插件（进程池，提交中的批数不超过 max_pending），结果写入缓存
+    :param cache: 已打开的该模型、该文件夹的 PrelabelCache，结果直接更新到其中；None 时打开
+    :return: {path: [(start, end, label, score)]}，读取失败或模型出错的文件不包含在内
+    """
+    key, window_s, hop_s, batch_size = model_info(spec)
+    if cache is None:
+        cache = PrelabelCache(folder_path, key)
+    results, todo = {}, []
+    for path in paths:
+        cached = cache.get(path)
+        if cached is not None:
+            results[path] = cached
+        else:
+            todo.append(path)
+    if not todo:
+        return results
+
+    def tasks():
+        for path in todo:
+            try:
+                info = sf.info(path)
+            except RuntimeError as e:
+                log(f"[prelabel] failed {path}: {str(e)}")
+                continue
+            window, hop = int(window_s * info.samplerate), max(int(hop_s * info.samplerate), 1)
+            starts = window_starts(info.frames, window, hop)
+            batches = [starts[i:i + batch_size] for i in range(0, len(starts), batch_size)]
+            for i, batch in enumerate(batches):
+                # 每个文件的最后一批带上文件时长，收到后即可合并该文件
+                yield (path, batch, window), (path, i == len(batches) - 1, info.frames / info.samplerate)
+
+    pending = {}
+    failed = set()
+
+    def collect(job):
+        (path, last, duration), regions = job[1], None
+        try:
+            regions = job[0].get()[1]
+        except Exception as e:
+            # 模型在某一批上出错：该文件记为失败，其他文件继续
+            if path not in failed:
+                log(f"[prelabel] model failed on {path}: {str(e)}")
+        if regions is None:
+            failed.add(path)
+        else:
+            pending.setdefault(path, []).extend(regions)
+        if last:
+            regions = pending.pop(path, [])
+            if path in failed:
+                return
+            results[path] = merge_regions(regions, duration)
+            cache.put(path, results[path])
+            log(f"[prelabel] {path}: {len(results[path])} regions")
+
+    try:
+        with Pool(jobs, initializer=_init_worker, initargs=(spec,)) as pool:
+            max_pending = max_pending or 2 * (jobs or os.cpu_count() or 1)
+            in_flight = deque()
+            for task, meta in tasks():
+                if len(in_flight) >= max_pending:
+                    collect(in_flight.popleft())
+                in_flight.append((pool.apply_async(_predict_batch, (task,)), meta))
+            while in_flight:
+                collect(in_flight.popleft())
+    finally:
+        # 中途被打断时已完成的文件也保存下来
+        cache.save()
+    return results
+
+
+def as_proposals(regions, min_score=MIN_SCORE):
+    """预测结果转为待复核的标注（带 "proposal": true 和 "score"）"""
+    return [{"start": start, "end": end, "label": label, "score": round(score, 4), "proposal": True}
+            for start, end, label, score in regions if score >= min_score]
+
+
+def energy_detector(batch, frame=0.02, threshold_db=-30.0):
+    """示例插件：帧能量高于阈值的连续区域记为 "event"，分数为峰值电平映射到 0~1"""
+    predictions = []
+    for y, sr in batch:
+        n = max(int(frame * sr), 1)
+        frames = y[:len(y) // n * n].reshape(-1, n)
+        db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+        active = np.r_[False, db > threshold_db, False]
+        edges = np.flatnonzero(np.diff(active.astype(np.int8)))
+        regions = []
+        for k0, k1 in zip(edges[::2], edges[1::2]):
+            score = float(np.clip((db[k0:k1].max() - threshold_db) / 30.0, 0, 1))
+            regions.append((k0 * n / sr, k1 * n / sr, "event", score))
+        predictions.append(regions)
+    return predictions
+
+
+energy_detector.version = "1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用插件模型为文件夹中的音频计算预标注（结果写入缓存）")
+    parser.add_argument("folder")
+    parser.add_argument("--model", required=True, help="插件，\"模块:函数\" 或 \"文件.py:函数\"")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为 CPU 核数")
+    args = parser.parse_args()
+    results = run_model(args.model, sorted(find_wav_files(args.folder)), args.folder, args.jobs,
+                        log=lambda msg: print(msg, file=sys.stderr))
+    print(f"[prelabel] {len(results)} files, {sum(len(r) for r in results.values())} regions")
+    sys.exit(0)
@@ -0,0 +1,147 @@
+"""
+标注复核队列
+
+复核已有标注时不必逐个打开整个文件：从文件夹中所有标注文件收集 (文件, 起点, 终点, 标签) 队列，
+只按窗口读取每个标注区域及前后 REVIEW_CONTEXT 秒的采样，在后台线程池中提前计算波形摘要和频谱图。
+复核结果直接写回标注文件：
+    accept   标注保留，记 "review": "accepted"（预标注同时去掉 "proposal" 和 "score"，转为普通标注）
+    relabel  修改标签文字，记 "review": "relabeled"（同上）
+    reject   删除该标注
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from labelio import (find_wav_files, label_json_path, read_label_file, write_label_file,
+                     LabelConflictError)
+from peakfile import WaveformPeaks
+from spectrogram import compute_spectrogram
+
+# 标注区域前后各多读取的上下文长度（秒）
+REVIEW_CONTEXT = 0.5
+# 提前准备的片段数
+PREFETCH = 16
+
+
+def build_review_queue(folder_path, include_reviewed=False):
+    """
+    收集文件夹中所有标注，按文件和起点排序
+    :param include_reviewed: 是否包含已复核过（带 "review" 字段）的标注
+    :return: [{"audio_path", "start", "end", "label"}]
+    """
+    queue = []
+    for audio_path in sorted(find_wav_files(folder_path)):
+        json_path = label_json_path(audio_path)
+        if not os.path.exists(json_path):
+            continue
+        try:
+            labels = read_label_file(json_path).get("labels", [])
+        except (OSError, ValueError) as e:
+            print(f"[review] failed {json_path}: {str(e)}")
+            continue
+        for label in sorted(labels, key=lambda label: label["start"]):
+            if label.get("review") and not include_reviewed:
+                continue
+            queue.append({"audio_path": audio_path, "start": label["start"], "end": label["end"],
+                          "label": str(label["label"])})
+    return queue
+
+
+def load_segment(item, context=REVIEW_CONTEXT, bandwidth=None):
+    """
+    只读取标注区域及其上下文，计算显示所需的数据（可在工作线程中调用）
+    :return: dict：samples、sample_rate、offset（窗口起点在文件中的时间，秒）、peaks，
+             以及 compute_spectrogram 的 image / extent / db_range（时间从窗口起点算起）
+    """
+    with sf.SoundFile(item["audio_path"]) as f:
+        sr = f.samplerate
+        start = max(int((item["start"] - context) * sr), 0)
+        stop = min(int(np.ceil((item["end"] + context) * sr)), f.frames)
+        f.seek(start)
+        samples = f.read(max(stop - start, 0), dtype='float32', always_2d=True)[:, 0]
+    image, extent, db_range = compute_spectrogram(samples, sr, bandwidth=bandwidth)
+    return {"samples": samples, "sample_rate": sr, "offset": start / sr,
+            "peaks": WaveformPeaks.from_audio(samples, sr),
+            "image": image, "extent": extent, "db_range": db_range}
+
+
+def apply_review(item, decision, new_label=None, retries=3):
+    """
+    把复核结果写回标注文件（按版本号检查，期间被他人修改时重新读取再写）
+    :param decision: "accept" / "relabel" / "reject"
+    :return: 是否找到并更新了该标注
+    """
+    json_path = label_json_path(item["audio_path"])
+    for _ in range(retries):
+        data = read_label_file(json_path)
+        labels = data.get("labels", [])
+        match = next((i for i, label in enumerate(labels)
+                      if label["start"] == item["start"] and label["end"] == item["end"]
+                      and str(label["label"]) == item["label"]), None)
+        if match is None:
+            return False
+        if decision == "reject":
+            labels.pop(match)
+        else:
+            if labels[match].pop("proposal", None):
+                labels[match].pop("score", None)
+            if decision == "relabel":
+                labels[match]["label"] = new_label
+                labels[match]["review"] = "relabeled"
+            else:
+                labels[match]["review"] = "accepted"
+        try:
+            write_label_file(json_path, data, expected_version=data.get("version", 0))
+            return True
+        except LabelConflictError:
+            continue
+    raise LabelConflictError(f"{json_path} keeps changing, review of {item['label']} not saved")
+
+
+class ReviewSession:
+    """复核队列的当前位置和后台预取"""
+
+    def __init__(self, queue, bandwidth=None, context=REVIEW_CONTEXT, prefetch=PREFETCH, workers=None):
+        self.queue = queue
+        self.bandwidth = bandwidth
+        self.context = context
+        self.prefetch = prefetch
+        self.position = 0
+        self.counts = {"accept": 0, "relabel": 0, "reject": 0, "skip": 0}
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self._schedule()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def _schedule(self):
+        """提交当前位置之后 prefetch 个片段，丢弃已经翻过的"""
+        for i in list(self.futures):
+            if i < self.position:
+                self.futures.pop(i).cancel()
+        for i in range(self.position, min(self.position + self.prefetch, len(self.queue))):
+            if i not in self.futures:
+                self.futures[i] = self.executor.submit(load_segment, self.queue[i], self.context, self.bandwidth)
+
+    def finished(self):
+        return self.position >= len(self.queue)
+
+    def current(self):
+        """当前的 (item, segment)；片段尚未准备好时等待，读取失败时抛出异常"""
+        return self.queue[self.position], self.futures[self.position].result()
+
+    def decide(self, decision, new_label=None):
+        """对当前片段作出复核决定并前进到下一个；decision 为 "skip" 时不写文件"""
+        if decision != "skip":
+            apply_review(self.queue[self.position], decision, new_label)
+        self.counts[decision] += 1
+        self.position += 1
+        self._schedule()
+
+    def close(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
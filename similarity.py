@@ -0,0 +1,200 @@
+"""
+相似事件检索
+
+为文件夹中每个已标注区域和未标注音频的滑动窗口计算一个紧凑的频谱嵌入（对数 Mel 谱的均值和标准差），
+保存为内存映射矩阵；给定一段音频，用向量化的余弦相似度找出最相近的 top-k 片段。
+
+索引保存在 <folder>/.anlabeler/similarity/ 下：
+    embeddings.f32   (N, EMBED_DIM) float32，已 L2 归一化，按内存映射读取
+    segments.npz     每行对应的文件、起止时间和标签（滑动窗口标签为空）
+
+建立索引：
+    python similarity.py <folder> [-j 8]
+"""
+import os
+import sys
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import soundfile as sf
+
+from labelio import accepted_labels, find_wav_files, label_json_path, read_label_file
+
+N_MELS = 40
+EMBED_DIM = 2 * N_MELS
+# 未标注音频的滑动窗口长度和步长（秒）
+WINDOW = 1.0
+HOP = 0.5
+
+
+def index_dir(folder_path):
+    return os.path.join(folder_path, '.anlabeler', 'similarity')
+
+
+def log_mel(y, sr):
+    """对数 Mel 谱 (n_frames, N_MELS) 及帧率（帧/秒）。25ms 窗、10ms 步长，最高 8kHz"""
+    import librosa
+    n_fft = int(0.025 * sr)
+    hop_length = max(int(0.010 * sr), 1)
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length,
+                                         n_mels=N_MELS, fmax=min(8000, sr / 2))
+    return np.log(mel.T + 1e-10).astype(np.float32), sr / hop_length
+
+
+def pooled_embeddings(logmel, frame_rate, segments):
+    """
+    对多个时间段一次性计算嵌入：用累加和求每段的均值和标准差，代价与段数成正比
+    :param segments: (n, 2) 起止时间（秒）
+    :return: (n, EMBED_DIM) float32，已 L2 归一化
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 2)
+    n_frames = len(logmel)
+    c1 = np.zeros((n_frames + 1, N_MELS))
+    c2 = np.zeros((n_frames + 1, N_MELS))
+    np.cumsum(logmel, axis=0, out=c1[1:])
+    np.cumsum(logmel.astype(np.float64) ** 2, axis=0, out=c2[1:])
+
+    f0 = np.clip((segments[:, 0] * frame_rate).astype(int), 0, max(n_frames - 1, 0))
+    f1 = np.clip(np.ceil(segments[:, 1] * frame_rate).astype(int), f0 + 1, n_frames)
+    n = (f1 - f0)[:, None]
+    mean = (c1[f1] - c1[f0]) / n
+    std = np.sqrt(np.maximum((c2[f1] - c2[f0]) / n - mean ** 2, 0))
+    # 去掉均值部分的整体电平，只保留频谱形状
+    mean -= mean.mean(axis=1, keepdims=True)
+    emb = np.hstack([mean, std]).astype(np.float32)
+    emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-10)
+    return emb
+
+
+def embed(y, sr):
+    """单段音频的嵌入 (EMBED_DIM,)"""
+    logmel, frame_rate = log_mel(np.asarray(y, dtype=np.float32), sr)
+    return pooled_embeddings(logmel, frame_rate, [(0, len(y) / sr)])[0]
+
+
+def _file_segments(audio_path):
+    """工作进程：一个文件的所有片段（已标注区域 + 滑动窗口）及其嵌入"""
+    try:
+        y, sr = sf.read(audio_path, dtype='float32', always_2d=True)
+        y = y[:, 0]
+        duration = len(y) / sr
+        segments, labels = [], []
+        json_path = label_json_path(audio_path)
+        if os.path.exists(json_path):
+            for label in accepted_labels(read_label_file(json_path).get("labels", [])):
+                segments.append((label["start"], label["end"]))
+                labels.append(str(label["label"]))
+        for start in np.arange(0, max(duration - WINDOW, 0) + HOP / 2, HOP):
+            segments.append((start, min(start + WINDOW, duration)))
+            labels.append("")
+        if not segments or len(y) == 0:
+            return audio_path, None, None, None
+        logmel, frame_rate = log_mel(y, sr)
+        return audio_path, pooled_embeddings(logmel, frame_rate, segments), np.array(segments), labels
+    except Exception as e:
+        print(f"[similarity] failed {audio_path}: {str(e)}")
+        return audio_path, None, None, None
+
+
+def build_index(folder_path, jobs=None, log=print):
+    """为文件夹建立索引（多进程，嵌入边算边追加写入磁盘）"""
+    out_dir = index_dir(folder_path)
+    os.makedirs(out_dir, exist_ok=True)
+    files = sorted(find_wav_files(folder_path))
+    position = {path: i for i, path in enumerate(files)}
+    file_index, starts, ends, labels = [], [], [], []
+    tmp_path = os.path.join(out_dir, 'embeddings.f32.tmp')
+    with open(tmp_path, 'wb') as f, Pool(jobs) as pool:
+        for audio_path, emb, segments, seg_labels in pool.imap(_file_segments, files, chunksize=4):
+            if emb is None:
+                continue
+            f.write(emb.tobytes())
+            file_index.extend([position[audio_path]] * len(emb))
+            starts.extend(segments[:, 0])
+            ends.extend(segments[:, 1])
+            labels.extend(seg_labels)
+            log(f"[similarity] {audio_path}: {len(emb)} segments")
+    os.replace(tmp_path, os.path.join(out_dir, 'embeddings.f32'))
+    np.savez(os.path.join(out_dir, 'segments.npz'),
+             files=np.array([os.path.relpath(p, folder_path) for p in files]),
+             file_index=np.array(file_index, dtype=np.int32),
+             start=np.array(starts, dtype=np.float64), end=np.array(ends, dtype=np.float64),
+             label=np.array(labels, dtype=str))
+    return SimilarityIndex.load(folder_path)
+
+
+class SimilarityIndex:
+    def __init__(self, folder_path, embeddings, files, file_index, start, end, label):
+        self.folder_path = folder_path
+        self.embeddings = embeddings
+        self.files = [os.path.join(folder_path, p) for p in files]
+        self.file_index = file_index
+        self.start = start
+        self.end = end
+        self.label = label
+
+    @classmethod
+    def load(cls, folder_path):
+        """读取索引，不存在时返回 None"""
+        out_dir = index_dir(folder_path)
+        emb_path = os.path.join(out_dir, 'embeddings.f32')
+        seg_path = os.path.join(out_dir, 'segments.npz')
+        if not (os.path.exists(emb_path) and os.path.exists(seg_path)):
+            return None
+        with np.load(seg_path) as seg:
+            meta = {key: seg[key] for key in ('files', 'file_index', 'start', 'end', 'label')}
+        n = len(meta['file_index'])
+        embeddings = (np.memmap(emb_path, dtype=np.float32, mode='r', shape=(n, EMBED_DIM))
+                      if n else np.zeros((0, EMBED_DIM), dtype=np.float32))
+        return cls(folder_path, embeddings, **meta)
+
+    def __len__(self):
+        return len(self.file_index)
+
+    def query(self, vector, k=20, exclude=None, chunk=1 << 16):
+        """
+        余弦相似度 top-k（嵌入已归一化，即点积）；同一文件中相互重叠的结果只保留得分最高的一个
+        :param exclude: (audio_path, start, end)，与之重叠的片段（通常是查询区域本身）不返回
+        :return: [(score, audio_path, start, end, label)]，按得分从高到低
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        n_pool = min(len(self), 20 * k)
+        if n_pool == 0:
+            return []
+        # 分块计算，内存映射矩阵不必整个读入内存；每块只保留候选
+        best_idx, best_score = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for i0 in range(0, len(self), chunk):
+            scores = self.embeddings[i0:i0 + chunk] @ vector
+            top = np.argpartition(-scores, min(n_pool, len(scores)) - 1)[:n_pool]
+            best_idx = np.concatenate([best_idx, top + i0])
+            best_score = np.concatenate([best_score, scores[top]])
+            if len(best_idx) > n_pool:
+                keep = np.argpartition(-best_score, n_pool - 1)[:n_pool]
+                best_idx, best_score = best_idx[keep], best_score[keep]
+
+        exclude_file = None
+        if exclude is not None:
+            exclude_file = os.path.abspath(exclude[0])
+        results = []
+        for j in np.argsort(-best_score):
+            i = best_idx[j]
+            path, start, end = self.files[self.file_index[i]], self.start[i], self.end[i]
+            if (exclude_file == os.path.abspath(path) and start < exclude[2] and exclude[1] < end):
+                continue
+            if any(r[1] == path and start < r[3] and r[2] < end for r in results):
+                continue
+            results.append((float(best_score[j]), path, float(start), float(end), str(self.label[i])))
+            if len(results) >= k:
+                break
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建立相似事件检索索引")
+    parser.add_argument("folder")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为 CPU 核数")
+    args = parser.parse_args()
+    index = build_index(args.folder, args.jobs)
+    print(f"[similarity] indexed {len(index)} segments")
+    sys.exit(0)
@@ -0,0 +1,221 @@
+"""
+频谱图计算：STFT、dB 转换与量化为显示图像
+
+不依赖 Qt，桌面端和服务端（label_server）共用。
+librosa、scipy.signal 导入很慢（合计 1s 以上），只在第一次计算时导入，见 warm_imports。
+
+比较分块多线程 STFT 与单线程 librosa.stft 的速度并检查结果一致：
+    python spectrogram.py <audio_file> [-j 8]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 抽取后的奈奎斯特频率至少为分析带宽的多少倍（给抗混叠滤波器留出过渡带）
+BANDWIDTH_MARGIN = 1.25
+# 分块 STFT 每块的帧数；总帧数不超过它时直接单线程计算
+STFT_CHUNK_FRAMES = 1 << 15
+# 频带放大：频带内的频率点数（频率分辨率约为带宽 / BAND_BINS）和时间帧数上限
+BAND_BINS = 256
+BAND_MAX_FRAMES = 1024
+
+
+def warm_imports():
+    """预先导入计算频谱图所需的重量级模块（可在后台线程中调用）"""
+    import librosa
+    import scipy.signal
+
+
+def decimation_factor(sample_rate, bandwidth):
+    """
+    满足分析带宽的最大整数抽取因子
+    :param bandwidth: 需要分析的最高频率（Hz），None 或 0 表示全频带
+    """
+    if not bandwidth:
+        return 1
+    return max(int(sample_rate // (2 * bandwidth * BANDWIDTH_MARGIN)), 1)
+
+
+def decimate_for_analysis(audio_data, sample_rate, bandwidth):
+    """
+    按分析带宽做多相抽取（scipy resample_poly，自带抗混叠滤波）
+    :return: (data, rate)，rate = sample_rate / q，可能不是整数；q=1 时原样返回
+    """
+    q = decimation_factor(sample_rate, bandwidth)
+    if q == 1:
+        return audio_data, sample_rate
+    from scipy.signal import resample_poly
+    return resample_poly(audio_data.astype(np.float32), 1, q), sample_rate / q
+
+
+def stft(y, n_fft, hop_length, workers=None, chunk_frames=STFT_CHUNK_FRAMES):
+    """
+    分块多线程 STFT，结果与 librosa.stft(y, n_fft=n_fft, hop_length=hop_length) 逐位相同
+    （center=True，两端补零）。信号按帧边界切成相互重叠的块，每块 center=False 单独计算后写入
+    预先分配的输出数组；FFT 和加窗都在 numpy 内部释放 GIL，线程池即可用满多核。
+    :param workers: 线程数，默认为 CPU 核数
+    :return: (1 + n_fft // 2, n_frames) 复数数组
+    """
+    import librosa
+
+    pad = n_fft // 2
+    n_frames = 1 + (len(y) + 2 * pad - n_fft) // hop_length
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or n_frames <= chunk_frames or len(y) < n_fft:
+        return librosa.stft(y, n_fft=n_fft, hop_length=hop_length)
+
+    y = np.pad(y, pad)
+    out = np.empty((1 + n_fft // 2, n_frames), dtype=np.result_type(y.dtype, np.complex64))
+
+    def compute(f0):
+        f1 = min(f0 + chunk_frames, n_frames)
+        segment = y[f0 * hop_length:(f1 - 1) * hop_length + n_fft]
+        out[:, f0:f1] = librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False)
+
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(compute, range(0, n_frames, chunk_frames)))
+    return out
+
+
+def spectrogram_image(S, power=False, top_db=80.0, amin=1e-10, dtype=np.uint8, ref_db=None):
+    """
+    将幅度/功率谱一次性转换为量化后的显示图像（dB 转换时顺带确定色阶）
+    :param S: 2D数组 (freq_bins, time_frames)，幅度谱、功率谱或复数 STFT
+    :param power: S 是否为功率谱（10*log10），否则按幅度（20*log10）
+    :param top_db: 显示的动态范围，最大值以下 top_db 的部分截断为 0
+    :param ref_db: 作为 0 dB 的参考值，None 时取 S 的最大值；分段增量计算时用固定参考，各段色阶才一致
+    :return: (image, db_range)
+             image 为 C 连续的 (time_frames, freq_bins) 整型数组，与 ImageItem 的坐标方向一致；
+             db_range 为 (db_min, db_max)，以最大值为 0 dB 参考（同 librosa ref=np.max）
+    """
+    n_levels = np.iinfo(dtype).max
+    # 转置写入一块连续的 float32 缓冲区，之后全部原地计算，只有这一次复制
+    img = np.empty(S.shape[::-1], dtype=np.float32)
+    np.abs(S.T, out=img)
+    np.maximum(img, amin, out=img)
+    np.log10(img, out=img)
+    img *= 10.0 if power else 20.0
+
+    db_max = float(img.max()) if ref_db is None else ref_db
+    img -= db_max - top_db
+    img *= n_levels / top_db
+    np.clip(img, 0, n_levels, out=img)
+    return img.astype(dtype), (-top_db, 0.0)
+
+
+def compute_spectrogram(audio_data, sample_rate, bandwidth=None, offset=0.0):
+    """
+    计算单声道音频的频谱显示图像
+    :param bandwidth: 分析带宽（Hz），高采样率音频先抽取到满足该带宽的较低采样率再做 STFT
+    :param offset: audio_data 第一个采样在原文件中的时间（秒），用于计算局部片段的坐标
+    :return: (image, extent, db_range)，image 见 spectrogram_image，
+             extent 为 (offset, offset + duration, 0, rate/2)，duration 按原始采样率计算
+    """
+    import librosa
+
+    # 设置显示范围（时间轴始终按原始采样数计算，与标注时间一致）
+    duration = len( audio_data ) / sample_rate
+    audio_data, sample_rate = decimate_for_analysis(audio_data, sample_rate, bandwidth)
+    max_freq = sample_rate / 2
+    extent = (offset, offset + duration, 0, max_freq)
+
+    # STFT参数
+    n_fft = max(int(sample_rate // 1000), 8) # 1ms，抽取到很低的采样率时至少 8 点
+    hop_length = n_fft // 2
+
+    TYPE = 1
+    if TYPE==1 or TYPE==2:
+        stft_matrix = stft(audio_data.astype(np.float32), n_fft=n_fft, hop_length=hop_length)
+        # 1. 使用librosa计算de频谱图 Good
+        image, db_range = spectrogram_image(stft_matrix)
+
+        if TYPE==2:
+            # 2. Mel滤波器组 
+            mel_filter = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=80)
+            mel_spectrogram = np.dot(mel_filter, np.abs(stft_matrix) ** 2)  # 功率谱 → Mel谱
+            image, db_range = spectrogram_image(mel_spectrogram, power=True)  # Log压缩
+
+    else:
+        audio_mono = audio_data.astype(np.float32)
+        audio_mono = audio_mono / np.max(np.abs(audio_mono))  # 归一化到[-1,1]
+
+        # 使用NumPy手动计算STFT
+        window = np.hanning(n_fft)
+        stft_matrix = np.array([
+            np.fft.rfft(window * audio_mono[i: i+n_fft], n=n_fft) for i in range(0, len(audio_mono)-n_fft, hop_length)
+        ]).T  # 转置得到 (频率bins, 时间帧)
+
+        image, db_range = spectrogram_image(stft_matrix, power=False)
+
+    return image, extent, db_range
+
+
+def band_spectrogram(audio_data, sample_rate, f_lo, f_hi, offset=0.0, n_bins=BAND_BINS, max_frames=BAND_MAX_FRAMES):
+    """
+    只计算 [f_lo, f_hi] 频带的高分辨率频谱（外差 + 抽取）：把频带中心移到 0 Hz，低通抽取到略高于带宽的采样率，
+    再做 n_fft 约为 n_bins * BANDWIDTH_MARGIN 的复数 STFT。频率分辨率约为 (f_hi - f_lo) / n_bins，
+    与整段使用同样分辨率的 STFT 相比，FFT 的点数和帧数都小得多
+    :param offset: audio_data 第一个采样在原文件中的时间（秒）
+    :return: (image, extent, db_range)，同 compute_spectrogram；extent 的频率范围为实际保留的频点范围
+    """
+    from scipy.signal import resample_poly
+
+    duration = len(audio_data) / sample_rate
+    f_lo, f_hi = max(f_lo, 0.0), min(f_hi, sample_rate / 2)
+    bandwidth = f_hi - f_lo
+    fc = (f_lo + f_hi) / 2
+
+    # 外差：乘以 exp(-j2πfc·t)，频带中心移到 0 Hz；相位按 float64 计算，长片段也不会漂移
+    phase = (-2 * np.pi * fc / sample_rate) * np.arange(len(audio_data))
+    x = audio_data.astype(np.float32) * np.exp(1j * phase).astype(np.complex64)
+    factor = max(int(sample_rate / (bandwidth * BANDWIDTH_MARGIN)), 1)
+    if factor > 1:
+        x = resample_poly(x, 1, factor).astype(np.complex64)
+    rate = sample_rate / factor
+
+    n_fft = min(max(int(round(n_bins * rate / bandwidth)), 8), max(len(x), 8))
+    hop_length = max(n_fft // 4, -(-len(x) // max_frames), 1)
+    x = np.pad(x, (n_fft // 2, n_fft - n_fft // 2))
+    frames = np.lib.stride_tricks.sliding_window_view(x, n_fft)[::hop_length]
+    S = np.fft.fftshift(np.fft.fft(frames * np.hanning(n_fft).astype(np.float32), axis=1), axes=1)
+    freqs = np.fft.fftshift(np.fft.fftfreq(n_fft, 1 / rate))
+    keep = np.abs(freqs) <= bandwidth / 2
+    image, db_range = spectrogram_image(S[:, keep].T)
+
+    df = rate / n_fft
+    kept = freqs[keep]
+    extent = (offset, offset + duration, float(fc + kept[0] - df / 2), float(fc + kept[-1] + df / 2))
+    return image, extent, db_range
+
+
+if __name__ == "__main__":
+    import librosa
+    import soundfile as sf
+
+    parser = argparse.ArgumentParser(description="分块多线程 STFT 与单线程 librosa.stft 的速度比较")
+    parser.add_argument("audio_file")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="线程数，默认为 CPU 核数")
+    args = parser.parse_args()
+
+    y, sr = sf.read(args.audio_file, dtype='float32', always_2d=True)
+    y = y[:, 0]
+    n_fft = max(int(sr // 1000), 8)
+    hop_length = n_fft // 2
+    workers = args.jobs or os.cpu_count() or 1
+    librosa.stft(y[:sr], n_fft=n_fft, hop_length=hop_length)  # 预热，计时不含 librosa 的初始化
+
+    t0 = time.perf_counter()
+    single = librosa.stft(y, n_fft=n_fft, hop_length=hop_length)
+    t1 = time.perf_counter()
+    chunked = stft(y, n_fft, hop_length, workers=workers)
+    t2 = time.perf_counter()
+
+    identical = single.shape == chunked.shape and single.tobytes() == chunked.tobytes()
+    print(f"[spectrogram] {single.shape[1]} frames, n_fft {n_fft}: single {t1 - t0:.3f}s, "
+          f"{workers} threads {t2 - t1:.3f}s, speedup {(t1 - t0) / (t2 - t1):.2f}x on "
+          f"{os.cpu_count()} cores, bit-identical: {identical}")
+    sys.exit(0 if identical else 1)
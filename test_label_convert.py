@@ -0,0 +1,91 @@
+"""
+标注格式转换测试：JSON -> 各格式 -> JSON 往返后标注不变，合并的 .rttm / .csv 能按文件拆回
+
+    python -m pytest test_label_convert.py
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from labelio import label_json_path, make_label_data, read_label_file, write_label_file
+from label_convert import FORMATS, convert_tree
+
+SAMPLE_RATE = 8000
+# 含重叠的标注（TextGrid 需要拆成多层）和尚未接受的预标注（不应导出）
+LABELS = {
+    os.path.join("a", "x.wav"): [{"start": 0.1, "end": 0.5, "label": "dog"},
+                                 {"start": 0.3, "end": 0.9, "label": "cat"},
+                                 {"start": 1.2, "end": 1.25, "label": "dog"}],
+    os.path.join("b", "y.wav"): [{"start": 0.0, "end": 1.5, "label": "speech"},
+                                 {"start": 1.6, "end": 1.7, "label": "bird", "score": 0.9, "proposal": True}],
+}
+
+
+def _expected(labels):
+    return sorted((label["start"], label["end"], label["label"]) for label in labels if not label.get("proposal"))
+
+
+class LabelConvertTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        for rel, labels in LABELS.items():
+            audio_path = os.path.join(self.src, rel)
+            os.makedirs(os.path.dirname(audio_path))
+            sf.write(audio_path, np.zeros(2 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+            write_label_file(label_json_path(audio_path), make_label_data(audio_path, SAMPLE_RATE, 2.0, labels))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertLabels(self, json_path, rel):
+        got = sorted((label["start"], label["end"], label["label"]) for label in read_label_file(json_path)["labels"])
+        expected = _expected(LABELS[rel])
+        self.assertEqual(len(got), len(expected), json_path)
+        for (start, end, label), (e_start, e_end, e_label) in zip(got, expected):
+            self.assertAlmostEqual(start, e_start, places=5)
+            self.assertAlmostEqual(end, e_end, places=5)
+            self.assertEqual(label, e_label)
+
+    def test_round_trip_per_file(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                out = os.path.join(self.tmp.name, fmt)
+                back = os.path.join(self.tmp.name, fmt + "-back")
+                self.assertEqual(convert_tree(self.src, out, "json", fmt, jobs=2, log=lambda msg: None),
+                                 (len(LABELS), []))
+                self.assertEqual(convert_tree(out, back, fmt, "json", jobs=2, log=lambda msg: None),
+                                 (len(LABELS), []))
+                for rel in LABELS:
+                    self.assertLabels(label_json_path(os.path.join(back, rel)), rel)
+
+    def test_round_trip_combined(self):
+        for fmt in ("rttm", "csv"):
+            with self.subTest(fmt=fmt):
+                combined = os.path.join(self.tmp.name, "all" + FORMATS[fmt][2])
+                back = os.path.join(self.tmp.name, fmt + "-split")
+                self.assertEqual(convert_tree(self.src, combined, "json", fmt, jobs=2, log=lambda msg: None),
+                                 (len(LABELS), []))
+                self.assertEqual(convert_tree(combined, back, fmt, "json", audio_dir=self.src,
+                                              log=lambda msg: None), (len(LABELS), []))
+                for rel in LABELS:
+                    json_path = label_json_path(os.path.join(back, rel))
+                    self.assertLabels(json_path, rel)
+                    # 找到了对应的音频：采样率取自音频文件
+                    self.assertEqual(read_label_file(json_path)["sample_rate"], SAMPLE_RATE)
+
+    def test_split_without_audio(self):
+        combined = os.path.join(self.tmp.name, "all.rttm")
+        convert_tree(self.src, combined, "json", "rttm", jobs=2, log=lambda msg: None)
+        back = os.path.join(self.tmp.name, "split")
+        self.assertEqual(convert_tree(combined, back, "rttm", "json", log=lambda msg: None), (len(LABELS), []))
+        for rel in LABELS:
+            file_id = os.path.splitext(os.path.basename(rel))[0]
+            self.assertLabels(os.path.join(back, file_id + ".json"), rel)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+标注服务协议测试：在临时目录上以随机端口启动 LabelServer，用 LabelClient 访问
+
+    python -m pytest test_label_server.py
+"""
+import os
+import asyncio
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from labelio import LabelConflictError, label_json_path, read_label_file
+from label_server import LabelClient, LabelServer
+
+
+class LabelServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.root = os.path.join(cls.tmp.name, "root")
+        os.makedirs(cls.root)
+        sf.write(os.path.join(cls.root, "a.wav"), np.zeros(8000, dtype=np.float32), 8000)
+        # 根目录之外的文件，不能通过服务端读写
+        cls.outside = os.path.join(cls.tmp.name, "outside.wav")
+        sf.write(cls.outside, np.zeros(8000, dtype=np.float32), 8000)
+
+        cls.loop = asyncio.new_event_loop()
+        server = LabelServer(cls.root)
+        cls.server = cls.loop.run_until_complete(asyncio.start_server(server.on_connection, '127.0.0.1', 0))
+        port = cls.server.sockets[0].getsockname()[1]
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.client = LabelClient(f"http://127.0.0.1:{port}", timeout=10)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join(5)
+        cls.server.close()
+        cls.loop.close()
+        cls.tmp.cleanup()
+
+    def test_put_round_trip(self):
+        labels = [{"start": 0.1, "end": 0.4, "label": "dog"}]
+        version = self.client.get_labels("a.wav")["version"]
+        new_version = self.client.put_labels("a.wav", labels, version=version)
+        self.assertEqual(new_version, version + 1)
+        data = self.client.get_labels("a.wav")
+        self.assertEqual(data["labels"], labels)
+        self.assertEqual(data["version"], new_version)
+        self.assertEqual(read_label_file(label_json_path(os.path.join(self.root, "a.wav")))["labels"], labels)
+
+    def test_stale_version_conflicts(self):
+        version = self.client.get_labels("a.wav")["version"]
+        self.client.put_labels("a.wav", [{"start": 0.0, "end": 0.1, "label": "first"}], version=version)
+        with self.assertRaises(LabelConflictError):
+            self.client.put_labels("a.wav", [{"start": 0.0, "end": 0.1, "label": "second"}], version=version)
+        self.assertEqual(self.client.get_labels("a.wav")["labels"][0]["label"], "first")
+
+    def test_path_traversal_rejected(self):
+        with self.assertRaises(RuntimeError):
+            self.client.get_labels("../outside.wav")
+        with self.assertRaises(RuntimeError):
+            self.client.put_labels("../outside.wav", [{"start": 0.0, "end": 0.1, "label": "x"}])
+        with self.assertRaises(RuntimeError):
+            self.client.get_samples(self.outside, 0, 10)
+        self.assertFalse(os.path.exists(label_json_path(self.outside)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+实时模式测试：另一个进程按实时速度写一个不断增长的 WAV（simulate_recording），边写边用 WavTail 读取，
+写完后与最终文件比较环形缓冲区的内容和绝对位置
+
+    python -m pytest test_live.py
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import unittest
+
+import librosa  # 第一次 poll 时才导入会占用 1 秒以上，期间录音已经写完
+import numpy as np
+import soundfile as sf
+
+from live import WavTail
+from spectrogram import spectrogram_image
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "live.py")
+SECONDS = 3
+RATE = 8000
+# 环形缓冲区短于录音，保证发生回绕
+CAPACITY = 1.0
+
+
+def _open_tail(path, timeout=10):
+    """等文件写出头部后打开"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return WavTail(path, capacity_seconds=CAPACITY)
+        except (OSError, ValueError):
+            if time.time() > deadline:
+                raise
+        time.sleep(0.01)
+
+
+class WavTailTest(unittest.TestCase):
+    def test_tail_growing_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "live.wav")
+            writer = subprocess.Popen([sys.executable, SCRIPT, path, "--seconds", str(SECONDS),
+                                       "--rate", str(RATE)])
+            try:
+                early, late = _open_tail(path), None
+                totals = []
+                while writer.poll() is None:
+                    early.poll()
+                    totals.append(early.source.total)
+                    # 打开时文件已长于缓冲区：只从最后 CAPACITY 秒开始读
+                    if late is None and early.source.total > 1.5 * CAPACITY * RATE:
+                        late = WavTail(path, capacity_seconds=CAPACITY)
+                    elif late is not None:
+                        late.poll()
+                    time.sleep(0.02)
+                self.assertEqual(writer.returncode, 0)
+            finally:
+                writer.kill()
+                writer.wait()
+            self.assertIsNotNone(late)
+            early.poll()
+            late.poll()
+
+            y, sr = sf.read(path, dtype='float32')
+            self.assertEqual(sr, RATE)
+            self.assertEqual(len(y), SECONDS * RATE)
+            # 边写边读：采样是分多次到达的
+            self.assertGreater(len(set(totals)), 5)
+            self.assertGreater(late.source.samples.first, 0)
+
+            capacity = int(CAPACITY * RATE)
+            for tail in (early, late):
+                source = tail.source
+                self.assertEqual(tail.position, len(y))
+                self.assertEqual(source.total, len(y))
+                self.assertEqual(source.samples.start, len(y) - capacity)
+                # 16 位 PCM 解码与 soundfile 的 float32 结果一致
+                np.testing.assert_array_equal(source.read(0, len(y)), y[-capacity:])
+                np.testing.assert_array_equal(source.read(len(y) - 100, len(y) - 50), y[-100:-50])
+
+                # 波形包络块：块 b 覆盖采样 [b*block, (b+1)*block)
+                blocks = source.envelope_blocks
+                self.assertEqual(blocks.count, len(y) // source.block)
+                x = y[blocks.start * source.block:blocks.count * source.block].reshape(-1, source.block)
+                np.testing.assert_array_equal(blocks.view(), np.stack([x.min(axis=1), x.max(axis=1)], axis=1))
+
+                # 频谱帧：帧 k 覆盖采样 [k*hop, k*hop + n_fft)，与一次性计算的结果相同
+                frames, hop, n_fft = source.frames, source.hop_length, source.n_fft
+                self.assertEqual(frames.count, (len(y) - n_fft) // hop + 1)
+                S = librosa.stft(y[frames.start * hop:(frames.count - 1) * hop + n_fft], n_fft=n_fft,
+                                 hop_length=hop, center=False)
+                image, _ = spectrogram_image(S, top_db=80.0, ref_db=source.ref_db)
+                np.testing.assert_array_equal(frames.view(), image)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""
+分块多线程 STFT 与单线程 librosa.stft 逐位相同（块边界、最后一块不满、信号短于 n_fft 等情况）
+
+    python -m pytest test_spectrogram.py
+"""
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from spectrogram import stft
+
+# 信号短于 n_fft 时 librosa 会警告，这里正是要覆盖的情况
+pytestmark = pytest.mark.filterwarnings("ignore:n_fft=.*too large:UserWarning")
+
+
+@pytest.mark.parametrize("n_fft", [8, 48, 256, 1023])
+@pytest.mark.parametrize("length", [5, 1000, 4096, 48000, 48001])
+@pytest.mark.parametrize("chunk_frames", [7, 64])
+def test_chunked_stft_matches_librosa(n_fft, length, chunk_frames):
+    y = np.random.default_rng(length * 31 + n_fft).standard_normal(length).astype(np.float32)
+    hop_length = max(n_fft // 2, 1)
+    expected = librosa.stft(y, n_fft=n_fft, hop_length=hop_length)
+    got = stft(y, n_fft, hop_length, workers=4, chunk_frames=chunk_frames)
+    assert got.shape == expected.shape
+    assert got.dtype == expected.dtype
+    assert got.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("hop_length", [1, 3, 100])
+def test_chunked_stft_hops(hop_length):
+    y = np.random.default_rng(hop_length).standard_normal(20000).astype(np.float32)
+    expected = librosa.stft(y, n_fft=256, hop_length=hop_length)
+    got = stft(y, 256, hop_length, workers=3, chunk_frames=50)
+    assert got.tobytes() == expected.tobytes()
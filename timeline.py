@@ -0,0 +1,130 @@
+"""
+多个短文件拼接成的连续时间轴
+
+关键词检测一类的数据集由成千上万个 1~2 秒的短文件组成，逐个打开、显示、保存的开销远大于标注本身。
+Timeline 把文件列表中连续的若干个文件首尾相接成一条时间轴，一次性解码、一次性计算显示数据；
+标注按其中点所在的文件归属回各自的文件（超出该文件的部分截掉），换页时批量写入有改动的标注文件。
+"""
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+
+from labelio import (label_json_path, make_label_data, read_label_file, write_label_file,
+                     LabelConflictError)
+
+# 每页拼接的文件数
+TIMELINE_FILES = 50
+
+
+def _label_key(labels):
+    """用于判断标注是否有改动"""
+    return [(round(label["start"], 6), round(label["end"], 6), str(label["label"])) for label in labels]
+
+
+class Timeline:
+    """一页拼接时间轴：文件、各文件在时间轴上的起点、拼接后的采样和各文件的标注"""
+
+    def __init__(self, paths, first_index, end_index, audio, sample_rate, offsets, file_labels, versions):
+        self.paths = paths
+        # 本页在 wav_files 中的范围 [first_index, end_index)（读取失败而跳过的文件也算在内）
+        self.first_index = first_index
+        self.end_index = end_index
+        self.audio = audio
+        self.sample_rate = sample_rate
+        # offsets[i] 为第 i 个文件的第一个采样在时间轴上的位置，offsets[-1] 为总长度
+        self.offsets = offsets
+        self.file_labels = file_labels
+        self.versions = versions
+
+    @classmethod
+    def load(cls, wav_files, first_index, n=TIMELINE_FILES):
+        """
+        从 wav_files[first_index] 开始拼接至多 n 个文件；遇到采样率不同的文件时本页到此为止
+        （第一个文件之外读取失败的文件跳过）
+        """
+        paths, parts, file_labels, versions = [], [], [], []
+        sample_rate = None
+        end_index = first_index
+        for path in wav_files[first_index:first_index + n]:
+            try:
+                with sf.SoundFile(path) as f:
+                    if sample_rate is not None and f.samplerate != sample_rate:
+                        break
+                    sample_rate = f.samplerate
+                    parts.append(f.read(dtype='float32', always_2d=True)[:, 0])
+            except RuntimeError as e:
+                if not paths:
+                    raise
+                print(f"[timeline] failed {path}: {str(e)}")
+                end_index += 1
+                continue
+            end_index += 1
+            json_path = label_json_path(path)
+            data = read_label_file(json_path) if os.path.exists(json_path) else {}
+            paths.append(path)
+            file_labels.append(data.get("labels", []))
+            versions.append(data.get("version", 0))
+
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(part) for part in parts], out=offsets[1:])
+        audio = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        return cls(paths, first_index, end_index, audio, sample_rate, offsets, file_labels, versions)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def starts(self):
+        """各文件在时间轴上的起点（秒）"""
+        return self.offsets[:-1] / self.sample_rate
+
+    def file_at(self, t):
+        """时间 t（秒）所在文件的序号"""
+        i = int(np.searchsorted(self.offsets, t * self.sample_rate, side='right')) - 1
+        return min(max(i, 0), len(self.paths) - 1)
+
+    def absolute_labels(self):
+        """所有文件的标注换算到时间轴上"""
+        labels = []
+        for start, file_labels in zip(self.starts(), self.file_labels):
+            for label in file_labels:
+                labels.append(dict(label, start=float(label["start"] + start), end=float(label["end"] + start)))
+        return labels
+
+    def split_labels(self, labels):
+        """把时间轴上的标注归属回各文件（按中点所在文件，超出文件的部分截掉），时间换算为文件内时间"""
+        starts = self.starts()
+        ends = self.offsets[1:] / self.sample_rate
+        per_file = [[] for _ in self.paths]
+        for label in sorted(labels, key=lambda label: label["start"]):
+            i = self.file_at((label["start"] + label["end"]) / 2)
+            start, end = max(label["start"], starts[i]), min(label["end"], ends[i])
+            if end > start:
+                # 换算后保留到微秒，去掉相减带来的浮点误差
+                per_file[i].append(dict(label, start=round(float(start - starts[i]), 6),
+                                        end=round(float(end - starts[i]), 6)))
+        return per_file
+
+    def save(self, labels):
+        """
+        批量写入有改动的标注文件（带版本检查）
+        :return: (写入的文件数, 冲突时另存的文件路径列表)
+        """
+        written, conflicts = 0, []
+        for i, file_labels in enumerate(self.split_labels(labels)):
+            if _label_key(file_labels) == _label_key(self.file_labels[i]):
+                continue
+            path = self.paths[i]
+            duration = (self.offsets[i + 1] - self.offsets[i]) / self.sample_rate
+            data = make_label_data(path, self.sample_rate, duration, file_labels)
+            try:
+                self.versions[i] = write_label_file(label_json_path(path), data, expected_version=self.versions[i])
+            except LabelConflictError:
+                conflict_path = os.path.splitext(path)[0] + f".conflict-{int(time.time())}.json"
+                write_label_file(conflict_path, data)
+                conflicts.append(conflict_path)
+                continue
+            self.file_labels[i] = file_labels
+            written += 1
+        return written, conflicts
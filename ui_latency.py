@@ -0,0 +1,219 @@
+"""
+界面延迟回归测试
+
+在 Qt offscreen 平台下运行 AudioLabeler，对不同长度的合成音频回放一组脚本化操作
+（打开、再次打开、切换文件、滚轮缩放、拖动选区、添加 1000 个标注、保存），
+记录每一步的耗时（直到事件队列处理完）和波形 / 频谱图视图的重绘次数。
+
+    python ui_latency.py --save-baseline latency.json     # 记录基线
+    python ui_latency.py --baseline latency.json          # 与基线比较，退步时返回 1
+
+某一步比基线慢 threshold 以上（且至少慢 MIN_REGRESSION 秒），或重绘次数多 threshold 以上时视为退步。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import soundfile as sf
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt, QObject, QEvent, QPoint, QPointF
+from PyQt5.QtGui import QWheelEvent
+from PyQt5.QtTest import QTest
+
+DURATIONS = (10, 60, 300)
+SAMPLE_RATE = 44100
+N_LABELS = 1000
+# 耗时差小于该值（秒）时不算退步，避免很快的步骤因计时抖动误报
+MIN_REGRESSION = 0.05
+
+
+class PaintCounter(QObject):
+    """统计被监视控件收到的 Paint 事件次数，并记录第一次重绘的时间"""
+
+    def __init__(self, widgets):
+        super().__init__()
+        self.count = 0
+        self.first_paint = None
+        for widget in widgets:
+            widget.installEventFilter(self)
+
+    def reset(self):
+        self.count = 0
+        self.first_paint = None
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.count += 1
+            if self.first_paint is None:
+                self.first_paint = time.perf_counter()
+        return False
+
+
+def make_audio(path, duration, sample_rate=SAMPLE_RATE):
+    """合成测试音频：噪声底上每秒一个短促的正弦脉冲"""
+    rng = np.random.default_rng(0)
+    y = (rng.standard_normal(int(duration * sample_rate)) * 0.01).astype(np.float32)
+    t = np.arange(int(0.1 * sample_rate)) / sample_rate
+    burst = (0.5 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+    for start in range(sample_rate // 2, len(y) - len(burst), sample_rate):
+        y[start:start + len(burst)] += burst
+    sf.write(path, y, sample_rate)
+
+
+def drain(app, idle_rounds=3):
+    """处理事件直到连续 idle_rounds 轮没有新的重绘"""
+    idle = 0
+    while idle < idle_rounds:
+        app.processEvents()
+        idle += 1
+        if app.hasPendingEvents():
+            idle = 0
+
+
+def wait_decoded(app, window, timeout=60):
+    """等待后台解码完成（有峰值文件时打开只显示概览，采样和频谱图在工作线程中计算）"""
+    deadline = time.perf_counter() + timeout
+    while window.audio_data is None and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    drain(app)
+
+
+def wheel(widget, steps, pos):
+    """向控件发送 steps 格滚轮事件（正数放大）"""
+    for _ in range(abs(steps)):
+        delta = QPoint(0, 120 if steps > 0 else -120)
+        event = QWheelEvent(QPointF(pos), QPointF(widget.mapToGlobal(pos)), QPoint(0, 0), delta,
+                            Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False)
+        QApplication.sendEvent(widget, event)
+
+
+def run_scenario(app, window, counter, paths):
+    """对一组同长度的文件回放脚本化操作，返回 {step: {"time", "paints"[, "first_paint"]}}"""
+    results = {}
+
+    def step(name, action):
+        counter.reset()
+        drain(app)
+        counter.reset()
+        t0 = time.perf_counter()
+        action()
+        drain(app)
+        elapsed = time.perf_counter() - t0
+        results[name] = {"time": elapsed, "paints": counter.count}
+        if counter.first_paint is not None:
+            results[name]["first_paint"] = counter.first_paint - t0
+
+    window.wav_files = list(paths)
+    window.current_file_index = 0
+    step("open", lambda: window.load_audio_file(paths[0]))
+    # 第一次打开时已写入峰值文件，再次打开走概览波形的快速路径；另记到后台解码完成（频谱图可见）为止的时间
+    step("open_cached", lambda: window.load_audio_file(paths[0]))
+    step("open_cached_decoded", lambda: (window.load_audio_file(paths[0]), wait_decoded(app, window)))
+    step("next_file", window.next_file)
+
+    waveform = window.waveform_view.viewport()
+    center = QPoint(waveform.width() // 2, waveform.height() // 2)
+    step("zoom_in", lambda: wheel(waveform, 10, center))
+    step("zoom_out", lambda: wheel(waveform, -10, center))
+
+    def drag():
+        x0, x1, y = int(waveform.width() * 0.3), int(waveform.width() * 0.6), waveform.height() // 2
+        QTest.mousePress(waveform, Qt.LeftButton, Qt.NoModifier, QPoint(x0, y))
+        for x in np.linspace(x0, x1, 20).astype(int):
+            QTest.mouseMove(waveform, QPoint(int(x), y))
+        QTest.mouseRelease(waveform, Qt.LeftButton, Qt.NoModifier, QPoint(x1, y))
+    step("drag_select", drag)
+
+    def add_labels():
+        duration = window.n_samples / window.sample_rate
+        for start in np.linspace(0, duration, N_LABELS, endpoint=False):
+            window.waveform_view.selection_start = start
+            window.waveform_view.selection_end = start + duration / N_LABELS / 2
+            window.add_label()
+    step(f"add_{N_LABELS}_labels", add_labels)
+    step("save", window.save_labels_auto)
+    window.clear_labels()
+    return results
+
+
+def run(durations=DURATIONS, sample_rate=SAMPLE_RATE):
+    import AudioLabeller
+    from AudioLabeller import AudioLabeler
+    from spectrogram import compute_spectrogram
+
+    # 脚本化操作不弹出对话框：标签输入固定返回 "event"，提示框直接忽略
+    AudioLabeller.QInputDialog.getText = staticmethod(lambda *args, **kwargs: ("event", True))
+    for name in ("information", "warning", "critical"):
+        setattr(AudioLabeller.QMessageBox, name, staticmethod(lambda *args, **kwargs: None))
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = AudioLabeler()
+    window.show()
+    # 正常启动时在后台预热，这里先算一次很短的频谱图，避免第一次打开的耗时里包含 librosa 的导入和初始化
+    compute_spectrogram(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+    counter = PaintCounter([window.waveform_view.viewport(), window.spectrogram_view.viewport()])
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="ui_latency_")
+    try:
+        for duration in durations:
+            paths = []
+            for i in range(2):
+                path = os.path.join(work_dir, f"{duration:g}s_{i}.wav")
+                make_audio(path, duration, sample_rate)
+                paths.append(path)
+            for name, value in run_scenario(app, window, counter, paths).items():
+                results[f"{duration:g}s/{name}"] = value
+    finally:
+        window.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """与基线比较，返回退步的描述列表"""
+    regressions = []
+    for key, value in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if value["time"] > base["time"] * (1 + threshold) and value["time"] - base["time"] > MIN_REGRESSION:
+            regressions.append(f"{key}: {value['time'] * 1000:.0f} ms (baseline {base['time'] * 1000:.0f} ms)")
+        if value["paints"] > max(base["paints"] * (1 + threshold), base["paints"] + 1):
+            regressions.append(f"{key}: {value['paints']} paints (baseline {base['paints']})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="界面延迟回归测试")
+    parser.add_argument("--durations", type=float, nargs="+", default=DURATIONS, help="合成音频的长度（秒）")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--baseline", help="与该基线文件比较")
+    parser.add_argument("--save-baseline", help="把结果写入基线文件")
+    parser.add_argument("--threshold", type=float, default=0.5, help="允许的相对退步，默认 0.5（慢 50%%）")
+    args = parser.parse_args()
+
+    results = run(args.durations, args.sample_rate)
+    print(f"{'step':<28}{'time ms':>10}{'first paint ms':>16}{'paints':>8}")
+    for key, value in results.items():
+        first_paint = f"{value['first_paint'] * 1000:.0f}" if "first_paint" in value else "-"
+        print(f"{key:<28}{value['time'] * 1000:>10.0f}{first_paint:>16}{value['paints']:>8}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print("[ui_latency] regression", line)
+        sys.exit(1 if regressions else 0)
+    sys.exit(0)